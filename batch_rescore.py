@@ -0,0 +1,191 @@
+"""
+Offline re-scoring of every candidate against every job for digest emails.
+
+Usage:
+    python batch_rescore.py --profiles profiles.jsonl --jobs jobs.jsonl --output matches.jsonl --k 20
+
+Profiles and jobs are read as JSONL (one object with an 'id' per line) and
+turned into text with GraniteService's own builders and embedding model, so
+scores match the online ranking (cosine similarity x 100). Job vectors are
+written to a temporary memory-mapped .npy that pool workers share; candidate
+chunks are scored against job blocks with one matrix product each and per-user
+top-K is kept with heaps. Results are appended to the output as each chunk
+finishes.
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set in each pool worker by _init_worker
+_job_vectors = None
+_job_ids: List[str] = []
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"{path}:{line_number}: skipping invalid JSON ({e.msg})")
+                continue
+            if not isinstance(record, dict):
+                logger.warning(f"{path}:{line_number}: skipping record that is not a JSON object")
+                continue
+            if record.get("id") is None:
+                logger.warning(f"{path}:{line_number}: skipping record without an id")
+                continue
+            yield record
+
+
+def chunked(records: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_jobs(service, path: str, chunk_size: int, directory: str) -> Tuple[str, List[str]]:
+    """Encode all jobs into a memory-mapped float32 .npy; returns (path, ids)."""
+    ids: List[str] = []
+    spill_path = os.path.join(directory, "jobs.partial.f32")
+    with open(spill_path, "wb") as spill:
+        for chunk in chunked(read_jsonl(path), chunk_size):
+            texts = [service._create_job_text(job) for job in chunk]
+            spill.write(np.ascontiguousarray(service.embeddings.encode_blocking(texts), dtype=np.float32).tobytes())
+            ids.extend(str(job["id"]) for job in chunk)
+
+    dimension = service.embeddings.dimension
+    matrix_path = os.path.join(directory, "jobs.npy")
+    matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=(len(ids), dimension))
+    if ids:
+        matrix[:] = np.memmap(spill_path, dtype=np.float32, mode="r", shape=(len(ids), dimension))
+    matrix.flush()
+    del matrix
+    os.remove(spill_path)
+    return matrix_path, ids
+
+
+def _init_worker(matrix_path: str, job_ids: List[str]):
+    global _job_vectors, _job_ids
+    _job_vectors = np.load(matrix_path, mmap_mode="r")
+    _job_ids = job_ids
+
+
+def score_chunk(user_ids: List[str], user_vectors: np.ndarray, k: int,
+                job_block: int, min_score: float) -> List[Dict[str, Any]]:
+    """Top-k jobs for each user in the chunk, scanning jobs block by block."""
+    heaps: List[List[Tuple[float, int]]] = [[] for _ in user_ids]
+    n_jobs = len(_job_ids)
+    for start in range(0, n_jobs, job_block):
+        block = np.asarray(_job_vectors[start:start + job_block])
+        scores = user_vectors @ block.T
+        take = min(k, block.shape[0])
+        if take < block.shape[0]:
+            candidates = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        else:
+            candidates = np.broadcast_to(np.arange(block.shape[0]), scores.shape)
+        for row, heap in enumerate(heaps):
+            for col in candidates[row]:
+                entry = (float(scores[row, col]), start + int(col))
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+    results = []
+    for user_id, heap in zip(user_ids, heaps):
+        matches = [
+            {"job_id": _job_ids[index], "match_score": round(min(100.0, max(0.0, score * 100)), 2)}
+            for score, index in sorted(heap, reverse=True)
+            if score * 100 >= min_score
+        ]
+        results.append({"user_id": user_id, "matches": matches})
+    return results
+
+
+def run(args) -> Dict[str, Any]:
+    from granite_services import GraniteService
+
+    started = time.perf_counter()
+    service = GraniteService()
+    # Same model and normalization as the online path
+    service._init_embeddings()
+
+    with tempfile.TemporaryDirectory(prefix="rescore-") as directory:
+        matrix_path, job_ids = encode_jobs(service, args.jobs, args.encode_batch, directory)
+        logger.info(f"Encoded {len(job_ids)} jobs in {time.perf_counter() - started:.1f}s")
+
+        users = 0
+        with open(args.output, "w") as out, ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init_worker, initargs=(matrix_path, job_ids)
+        ) as pool:
+            pending = set()
+            for chunk in chunked(read_jsonl(args.profiles), args.user_chunk):
+                texts = [service._create_user_profile_text(profile) for profile in chunk]
+                vectors = service.embeddings.encode_blocking(texts)
+                pending.add(pool.submit(
+                    score_chunk, [str(p["id"]) for p in chunk], vectors,
+                    args.k, args.job_block, args.min_score
+                ))
+                users += len(chunk)
+                # Bound memory: keep at most two chunks per worker in flight
+                while len(pending) >= args.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _write_results(out, done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _write_results(out, done)
+
+    return {
+        "users": users,
+        "jobs": len(job_ids),
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "output": args.output,
+    }
+
+
+def _write_results(out, futures):
+    for future in futures:
+        for result in future.result():
+            out.write(json.dumps(result) + "\n")
+    out.flush()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Re-score all candidate/job pairs offline")
+    parser.add_argument("--profiles", required=True, help="JSONL of candidate profiles")
+    parser.add_argument("--jobs", required=True, help="JSONL of job postings")
+    parser.add_argument("--output", default="matches.jsonl", help="JSONL of per-user top-K matches")
+    parser.add_argument("--k", type=int, default=20, help="matches kept per user")
+    parser.add_argument("--min-score", type=float, default=0.0, help="drop matches below this score (0-100)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--user-chunk", type=int, default=512, help="candidates per scoring task")
+    parser.add_argument("--job-block", type=int, default=8192, help="jobs per matrix product")
+    parser.add_argument("--encode-batch", type=int, default=256, help="texts per embedding batch")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = run(args)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
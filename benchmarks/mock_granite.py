@@ -0,0 +1,110 @@
+"""
+Local stand-ins for the Granite generate APIs used by the benchmarks.
+
+MockGenerativeModel mimics ibm_generative_ai.GenerativeModel (generate and
+generate_stream); MockAPIClient mimics the WML APIClient's
+foundation_models/deployments.generate_text. Both are blocking, like the real
+SDKs, so they exercise the same executor paths.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+
+@dataclass
+class MockBehaviour:
+    latency: float = 0.2        # Seconds before the first token
+    token_rate: float = 200.0   # Tokens per second after the first token
+    error_rate: float = 0.0     # Fraction of calls that raise
+    tokens: int = 300           # Tokens per response (capped by max_new_tokens)
+    seed: Optional[int] = None
+
+
+class MockGraniteError(Exception):
+    pass
+
+
+class _Backend:
+    def __init__(self, behaviour: MockBehaviour):
+        self.behaviour = behaviour
+        self._random = random.Random(behaviour.seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _tokens(self, prompt: str, max_new_tokens: int) -> Iterator[str]:
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.behaviour.error_rate
+        time.sleep(self.behaviour.latency)
+        if fail:
+            raise MockGraniteError("mock Granite backend error")
+
+        count = min(self.behaviour.tokens, max_new_tokens or self.behaviour.tokens)
+        delay = 1.0 / self.behaviour.token_rate if self.behaviour.token_rate > 0 else 0
+        words = ["Overview", "of", "the", "role", "at", "our", "store."]
+        for i in range(count):
+            if delay:
+                time.sleep(delay)
+            if i and i % 40 == 0:
+                yield "\n\n- "
+            yield words[i % len(words)] + " "
+
+    def complete(self, prompt: str, max_new_tokens: int) -> str:
+        return "".join(self._tokens(prompt, max_new_tokens)).strip()
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.generated_text = text
+
+
+class MockGenerativeModel:
+    """Drop-in for ibm_generative_ai.GenerativeModel."""
+
+    def __init__(self, behaviour: MockBehaviour = None, model_id: str = "mock/granite"):
+        self.model_id = model_id
+        self.backend = _Backend(behaviour or MockBehaviour())
+
+    def generate(self, prompt: str, max_new_tokens: int = 0, **params) -> _Response:
+        return _Response(self.backend.complete(prompt, max_new_tokens))
+
+    def generate_stream(self, prompt: str, max_new_tokens: int = 0, **params) -> Iterator[_Response]:
+        for token in self.backend._tokens(prompt, max_new_tokens):
+            yield _Response(token)
+
+
+class MockModelRegistry:
+    """Drop-in for ibm_utils.ModelRegistry that hands out one mock model."""
+
+    def __init__(self, behaviour: MockBehaviour = None):
+        self.model = MockGenerativeModel(behaviour)
+
+    def start(self):
+        pass
+
+    def get_model(self, model_id: str = None) -> MockGenerativeModel:
+        return self.model
+
+    def close(self):
+        pass
+
+
+class _GenerateText:
+    def __init__(self, backend: _Backend):
+        self._backend = backend
+
+    def generate_text(self, prompt: str, params: Dict[str, Any] = None, **kwargs) -> Dict[str, Any]:
+        max_new_tokens = (params or {}).get("max_new_tokens", 0)
+        text = self._backend.complete(prompt, max_new_tokens)
+        return {"results": [{"generated_text": text}]}
+
+
+class MockAPIClient:
+    """Drop-in for ibm_watson_machine_learning.APIClient's generate calls."""
+
+    def __init__(self, behaviour: MockBehaviour = None):
+        self.backend = _Backend(behaviour or MockBehaviour())
+        self.foundation_models = _GenerateText(self.backend)
+        self.deployments = _GenerateText(self.backend)
@@ -0,0 +1,236 @@
+"""
+Benchmark the generation routes and GraniteService against a mock Granite.
+
+Usage:
+    python -m benchmarks.run --concurrency 16 --requests 200 --output bench.json
+
+Each scenario reports p50/p95/p99 latency and throughput from an untraced
+pass, then peak Python memory from a separate tracemalloc pass on fresh
+state, so tracing overhead never skews the timings. Time to first byte is
+not reported: httpx's ASGITransport buffers the whole response, so it would
+only measure full latency again.
+The whole run is written as JSON so results can be compared across releases.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.mock_granite import MockAPIClient, MockBehaviour, MockModelRegistry
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def drive(call: Callable[[int], Awaitable[bool]],
+                requests: int, concurrency: int) -> Dict[str, Any]:
+    """Run `requests` calls with at most `concurrency` in flight and summarize them."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        },
+    }
+
+
+async def peak_memory(call: Callable[[int], Awaitable[bool]],
+                      requests: int, concurrency: int) -> int:
+    """Peak traced Python memory over a run; timings from this pass are discarded."""
+    tracemalloc.start()
+    try:
+        await drive(call, requests, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+async def run_scenario(open_call, args) -> Dict[str, Any]:
+    """Timed pass, then a separate memory pass, each with a freshly opened call."""
+    async with open_call() as call:
+        result = await drive(call, args.requests, args.concurrency)
+    if not args.skip_memory:
+        async with open_call() as call:
+            result["peak_python_memory_bytes"] = await peak_memory(call, args.requests, args.concurrency)
+    return result
+
+
+def reset_app_state(behaviour: MockBehaviour):
+    """
+    Fresh caches, pool, rate limiter and breakers, and a mock model registry
+    on main.app, so no scenario inherits warm or tripped state from the last.
+    """
+    import main
+    import generation_pool
+    import ibm_utils
+    import rate_limit
+    import resilience
+    import response_cache
+
+    generation_pool.shutdown_generation_pool()
+    rate_limit.reset_rate_limiter()
+    resilience.reset_resilience()
+    response_cache._cache = response_cache.ResponseCache(db_path="")
+    ibm_utils._format_cache.clear()
+    ibm_utils._job_flights = ibm_utils.SingleFlight()
+    ibm_utils.set_semantic_cache(None)
+    main.app.state.model_registry = MockModelRegistry(behaviour)
+    return main.app
+
+
+def form_scenario(client, unique: bool):
+    async def call(i: int):
+        role = f"Cashier {i}" if unique else "Cashier"
+        response = await client.post(
+            "/generate-job-description",
+            data={"role": role, "skills": "customer service", "hours": "9-5"},
+        )
+        return response.status_code == 200 and b'<span class="block sm:inline">' not in response.content
+    return call
+
+
+def stream_scenario(client):
+    async def call(i: int):
+        response = await client.get(
+            "/generate-job-description/stream",
+            params={"role": f"Stocker {i}", "skills": "lifting", "hours": "nights"},
+        )
+        return response.status_code == 200 and "event: error" not in response.text
+    return call
+
+
+def store_job_scenario(service, unique: bool):
+    async def call(i: int):
+        result = await service.generate_store_job_description({
+            "job_title": f"Cashier {i}" if unique else "Cashier",
+            "store_name": "Corner Market",
+            "location": "Springfield",
+            "working_hours": "9-5",
+        })
+        return bool(result.get("enhanced_description"))
+    return call
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    behaviour = MockBehaviour(
+        latency=args.latency, token_rate=args.token_rate,
+        error_rate=args.error_rate, tokens=args.tokens, seed=args.seed,
+    )
+    results: Dict[str, Any] = {}
+
+    scenarios = [
+        ("form_post_unique", lambda c: form_scenario(c, unique=True)),
+        ("form_post_repeated", lambda c: form_scenario(c, unique=False)),
+        ("stream_sse", stream_scenario),
+    ]
+    for name, build in scenarios:
+        @asynccontextmanager
+        async def open_call(build=build):
+            app = reset_app_state(behaviour)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                yield build(client)
+
+        results[name] = await run_scenario(open_call, args)
+        print(f"{name}: {json.dumps(results[name]['latency_ms'])}", file=sys.stderr)
+
+    try:
+        from granite_services import GraniteService
+    except ImportError as e:
+        print(f"Skipping GraniteService scenarios: {e}", file=sys.stderr)
+    else:
+        for name, unique in (("store_job_unique", True), ("store_job_repeated", False)):
+            @asynccontextmanager
+            async def open_call(unique=unique):
+                reset_app_state(behaviour)
+                service = GraniteService()
+                service.client = MockAPIClient(behaviour)
+                service.client_ready = True
+                yield store_job_scenario(service, unique)
+
+            results[name] = await run_scenario(open_call, args)
+            print(f"{name}: {json.dumps(results[name]['latency_ms'])}", file=sys.stderr)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock": vars(behaviour),
+        "rate_limit_rps": args.rate_limit,
+        "scenarios": results,
+        # ru_maxrss is the high-water mark of the whole benchmark process, not per scenario
+        "process_max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark job description generation")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds before first token")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="mock tokens per second")
+    parser.add_argument("--tokens", type=int, default=300, help="mock tokens per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock fraction of failed calls")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the separate tracemalloc pass")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="apply a Granite quota (requests/s); off by default so the app is measured, not the bucket")
+    args = parser.parse_args(argv)
+
+    os.environ.pop("GRANITE_RATE_LIMIT_DB", None)
+    if args.rate_limit:
+        os.environ["GRANITE_RATE_LIMIT"] = str(args.rate_limit)
+    else:
+        os.environ.pop("GRANITE_RATE_LIMIT", None)
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
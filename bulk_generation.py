@@ -0,0 +1,130 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import random
+from typing import Any, AsyncIterator, Dict, List
+
+from generation_pool import GenerationQueueFull
+from ibm_utils import generate_job_description
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_ROWS = int(os.getenv("BULK_MAX_ROWS", "500"))
+
+
+def parse_bulk_upload(content: bytes, filename: str = "") -> List[Dict[str, Any]]:
+    """
+    Parse a JSONL or CSV upload into job input rows.
+
+    CSV is assumed when the filename ends in .csv or the first non-blank
+    character is not '{'.
+    """
+    text = content.decode("utf-8-sig")
+    stripped = text.lstrip()
+    if filename.lower().endswith(".csv") or not stripped.startswith("{"):
+        rows = [dict(row) for row in csv.DictReader(io.StringIO(text))]
+    else:
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number} is not valid JSON: {e.msg}")
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {line_number} is not a JSON object")
+            rows.append(row)
+
+    if len(rows) > MAX_BULK_ROWS:
+        raise ValueError(f"Too many rows ({len(rows)}); the limit is {MAX_BULK_ROWS}")
+    return rows
+
+
+class BulkScheduler:
+    """
+    Run many generations under a shared rate limit and stream results.
+
+    Rows with role/skills/hours use generate_job_description; rows with a
+    job_title use GraniteService.generate_store_job_description, with
+    fallback text treated as a failure. Every model call goes through the
+    generation pool (and its rate limiter, when a quota is configured), so
+    bulk and interactive traffic share one budget. Failed rows are retried with
+    exponential backoff and jitter.
+    """
+
+    def __init__(self, granite_service=None, max_concurrency: int = None,
+                 max_retries: int = None, backoff: float = None):
+        self.granite_service = granite_service
+        self.max_concurrency = max_concurrency or int(os.getenv("BULK_MAX_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("BULK_MAX_RETRIES", "3"))
+        self.backoff = backoff or float(os.getenv("BULK_BACKOFF", "1.0"))
+
+    async def run(self, rows: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one result dict per row, in completion order."""
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_row(index: int, row: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    result = await self._run_with_retries(index, row)
+                except Exception as e:
+                    # Every row must report, or the stream below never ends
+                    logger.error(f"Bulk row {index} failed unexpectedly: {str(e)}")
+                    result = {"row": index, "status": "error", "error": str(e), "attempts": 0}
+                await queue.put(result)
+
+        tasks = [asyncio.ensure_future(run_row(i, row)) for i, row in enumerate(rows)]
+        try:
+            for _ in range(len(tasks)):
+                yield await queue.get()
+        finally:
+            # Client went away: stop scheduling the rest
+            for task in tasks:
+                task.cancel()
+
+    async def _run_with_retries(self, index: int, row: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            generate = self._plan(row)
+        except ValueError as e:
+            return {"row": index, "status": "error", "error": str(e), "attempts": 0}
+
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                result = await generate()
+                return {"row": index, "status": "ok", "result": result, "attempts": attempt}
+            except Exception as e:
+                if attempt > self.max_retries:
+                    return {"row": index, "status": "error", "error": str(e), "attempts": attempt}
+                delay = getattr(e, "retry_after", None) if isinstance(e, GenerationQueueFull) else None
+                if delay is None:
+                    delay = self.backoff * (2 ** (attempt - 1))
+                delay *= 0.5 + random.random()
+                logger.warning(f"Bulk row {index} attempt {attempt} failed, retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
+
+    def _plan(self, row: Dict[str, Any]):
+        """Pick the coroutine factory that generates a row."""
+        if row.get("job_title"):
+            if self.granite_service is None:
+                raise ValueError("Store job rows need the Granite service, which is not available")
+            service = self.granite_service
+            # Raise on fallback text so the row is retried instead of reported as ok
+            return lambda: service.generate_store_job_description(row, allow_fallback=False)
+
+        missing = [field for field in ("role", "skills", "hours") if not row.get(field)]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+        use_cache = str(row.get("fresh", "")).lower() not in ("1", "true", "yes")
+
+        async def generate():
+            return {
+                "job_description": await generate_job_description(
+                    row["role"], row["skills"], row["hours"], use_cache=use_cache
+                )
+            }
+        return generate
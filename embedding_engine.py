@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+
+def text_key(text: str) -> str:
+    """Stable cache key for an embedding input."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingEngine:
+    """
+    Micro-batching front end for a SentenceTransformer model.
+
+    Concurrent encode() calls are gathered for up to ``max_wait`` seconds (or
+    until ``max_batch`` texts are pending) and encoded in one model call off
+    the event loop. Vectors are L2-normalized float32, so cosine similarity
+    is a plain dot product, and are kept in an LRU cache keyed by text hash.
+    """
+
+    def __init__(self, model, max_batch: int = 64, max_wait: float = 0.005,
+                 cache_size: int = 10000):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix of normalized embeddings."""
+        loop = asyncio.get_running_loop()
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        waiting = []
+
+        for i, text in enumerate(texts):
+            key = text_key(text)
+            vector = self._cache_get(key)
+            if vector is not None:
+                vectors[i] = vector
+                continue
+            future = loop.create_future()
+            self._pending.append((key, text, future))
+            waiting.append((i, future))
+
+        if waiting:
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.max_wait, self._flush)
+            for i, future in waiting:
+                vectors[i] = await future
+
+        if not vectors:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.vstack(vectors)
+
+    async def encode_one(self, text: str) -> np.ndarray:
+        """Return one normalized embedding vector."""
+        return (await self.encode([text]))[0]
+
+    def encode_blocking(self, texts: List[str]) -> np.ndarray:
+        """Synchronous, cache-aware encode for batch jobs outside the event loop."""
+        keys = [text_key(t) for t in texts]
+        vectors = [self._cache_get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            encoded = self._encode_batch([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                self._cache_put(keys[i], vector)
+                vectors[i] = vector
+        if not vectors:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        # Identical texts in one batch are encoded once
+        unique: Dict[str, str] = {}
+        for key, text, _ in batch:
+            unique.setdefault(key, text)
+        keys = list(unique)
+        try:
+            loop = asyncio.get_running_loop()
+            encoded = await loop.run_in_executor(
+                None, self._encode_batch, [unique[k] for k in keys]
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_key = dict(zip(keys, encoded))
+        for key, vector in by_key.items():
+            self._cache_put(key, vector)
+        for key, _, future in batch:
+            if not future.done():
+                future.set_result(by_key[key])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        self.batches += 1
+        with metrics.stage("encode", "embeddings"):
+            embeddings = self.model.encode(
+                texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+            )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _cache_put(self, key: str, vector: np.ndarray):
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "batches": self.batches,
+            "cached": len(self._cache),
+        }
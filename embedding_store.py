@@ -0,0 +1,233 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per step when dequantizing int8 vectors
+SEARCH_CHUNK_ROWS = 65536
+
+
+def content_hash(text: str) -> str:
+    """Hash of the exact text a row was encoded from."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class _Generation(NamedTuple):
+    """One mapped generation; replaced as a whole so readers never see a mix."""
+    name: Optional[str]
+    ids: List[Hashable]
+    hashes: List[str]
+    rows: Dict[Hashable, int]
+    vectors: Optional[np.ndarray]
+    scales: Optional[np.ndarray]
+    quantize: bool
+
+
+class EmbeddingStore:
+    """
+    Persistent, memory-mapped matrix of normalized job embeddings.
+
+    Each sync writes a new generation directory (vectors, optional int8
+    scales and an id/hash index) and then atomically repoints ``CURRENT``.
+    Readers map the current generation read-only, so every worker on the
+    host shares the same page-cache pages instead of its own copy. Only rows
+    whose text hash changed are re-encoded.
+    """
+
+    def __init__(self, directory: str, dimension: int, quantize: bool = False):
+        self.directory = directory
+        self.dimension = dimension
+        self._state = _Generation(None, [], [], {}, None, None, quantize)
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def ids(self) -> List[Hashable]:
+        return self._state.ids
+
+    @property
+    def quantize(self) -> bool:
+        return self._state.quantize
+
+    def __len__(self) -> int:
+        return len(self._state.ids)
+
+    def __contains__(self, job_id: Hashable) -> bool:
+        return job_id in self._state.rows
+
+    def load(self) -> bool:
+        """Map the current generation if it changed; returns False if none exists."""
+        current = self._read_current()
+        if current is None:
+            return False
+        if current == self._state.name:
+            return True
+
+        gen_dir = os.path.join(self.directory, current)
+        with open(os.path.join(gen_dir, "index.json")) as f:
+            index = json.load(f)
+        if index["dimension"] != self.dimension:
+            logger.warning("Embedding store dimension mismatch; ignoring stored vectors")
+            return False
+
+        ids = index["ids"]
+        quantize = index["dtype"] == "int8"
+        vectors = scales = None
+        if ids:
+            vectors = np.load(os.path.join(gen_dir, "vectors.npy"), mmap_mode="r")
+            if quantize:
+                scales = np.load(os.path.join(gen_dir, "scales.npy"), mmap_mode="r")
+        # Searches running on other threads keep the generation they started with
+        self._state = _Generation(
+            current, ids, index["hashes"], {job_id: row for row, job_id in enumerate(ids)},
+            vectors, scales, quantize
+        )
+        return True
+
+    def sync(self, texts: Dict[Hashable, str],
+             encode: Callable[[List[str]], np.ndarray]) -> int:
+        """
+        Make the store hold exactly the given id -> text mapping.
+
+        Unchanged rows are copied from the current generation; only new or
+        edited texts are passed to ``encode``. Returns the number of rows
+        encoded. Concurrent syncs from other workers are serialized with a
+        file lock.
+        """
+        with open(os.path.join(self.directory, "sync.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.load()
+            state = self._state
+
+            ids = list(texts)
+            hashes = [content_hash(texts[job_id]) for job_id in ids]
+            stale = [
+                i for i, (job_id, h) in enumerate(zip(ids, hashes))
+                if state.rows.get(job_id) is None or state.hashes[state.rows[job_id]] != h
+            ]
+            if not stale and len(ids) == len(state.ids) and state.name is not None:
+                return 0
+
+            dtype = np.int8 if state.quantize else np.float32
+            vectors = np.zeros((len(ids), self.dimension), dtype=dtype)
+            scales = np.ones(len(ids), dtype=np.float32)
+            stale_set = set(stale)
+            for i, job_id in enumerate(ids):
+                if i not in stale_set:
+                    row = state.rows[job_id]
+                    vectors[i] = state.vectors[row]
+                    if state.quantize:
+                        scales[i] = state.scales[row]
+            if stale:
+                encoded = np.asarray(encode([texts[ids[i]] for i in stale]), dtype=np.float32)
+                if state.quantize:
+                    q, s = quantize_int8(encoded)
+                    vectors[stale], scales[stale] = q, s
+                else:
+                    vectors[stale] = encoded
+
+            self._write_generation(ids, hashes, vectors, scales if state.quantize else None)
+            self.load()
+            return len(stale)
+
+    def search(self, query: np.ndarray, k: int,
+               exclude: Optional[Set[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """Top-k (job_id, similarity) pairs, skipping ids in exclude."""
+        self.load()
+        state = self._state
+        n = len(state.ids)
+        if n == 0 or k <= 0:
+            return []
+        scores = self._scores(state, query)
+        if exclude:
+            for job_id in exclude:
+                row = state.rows.get(job_id)
+                if row is not None:
+                    scores[row] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        return [(state.ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Similarity of every stored row to a normalized query."""
+        return self._scores(self._state, query)
+
+    @staticmethod
+    def _scores(state: _Generation, query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32)
+        if not state.quantize:
+            return np.asarray(state.vectors @ query, dtype=np.float32)
+        out = np.empty(len(state.ids), dtype=np.float32)
+        for start in range(0, len(state.ids), SEARCH_CHUNK_ROWS):
+            end = start + SEARCH_CHUNK_ROWS
+            out[start:end] = (state.vectors[start:end].astype(np.float32) @ query) * state.scales[start:end]
+        return out
+
+    def vector(self, job_id: Hashable) -> Optional[np.ndarray]:
+        """Dequantized float32 vector for one id."""
+        state = self._state
+        row = state.rows.get(job_id)
+        if row is None:
+            return None
+        vector = np.asarray(state.vectors[row], dtype=np.float32)
+        return vector * state.scales[row] if state.quantize else vector
+
+    def _read_current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _generation_numbers(self) -> List[int]:
+        numbers = []
+        for entry in os.listdir(self.directory):
+            prefix, _, number = entry.partition("-")
+            if prefix == "gen" and number.isdigit():
+                numbers.append(int(number))
+        return numbers
+
+    def _write_generation(self, ids, hashes, vectors, scales):
+        # Number from the directories on disk: our state may be empty after a
+        # rejected load while older generations still exist
+        previous = self._read_current()
+        number = max(self._generation_numbers(), default=0) + 1
+        name = f"gen-{number:06d}"
+        gen_dir = os.path.join(self.directory, name)
+        os.makedirs(gen_dir, exist_ok=True)
+
+        np.save(os.path.join(gen_dir, "vectors.npy"), vectors)
+        if scales is not None:
+            np.save(os.path.join(gen_dir, "scales.npy"), scales)
+        with open(os.path.join(gen_dir, "index.json"), "w") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "dtype": "int8" if scales is not None else "float32",
+                "ids": ids,
+                "hashes": hashes,
+            }, f)
+
+        tmp = os.path.join(self.directory, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(self.directory, "CURRENT"))
+
+        # Readers that still map the old generation keep their pages after unlink
+        for entry in os.listdir(self.directory):
+            if entry.startswith("gen-") and entry not in (name, previous, self._state.name):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; returns (values, scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    values = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return values, scales.astype(np.float32)
@@ -0,0 +1,237 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from metrics import metrics
+from rate_limit import get_rate_limiter
+
+
+class GenerationQueueFull(Exception):
+    """Raised when a generation cannot be scheduled; carries a Retry-After hint."""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GenerationSlot:
+    """
+    A reserved place in the generation pool.
+
+    Used once, by run() or stream(); a slot that ends up unused must be
+    handed back with release(), which is a no-op after it was used.
+    """
+
+    def __init__(self, pool: "GenerationPool", semaphore: asyncio.Semaphore):
+        self._pool = pool
+        self._semaphore = semaphore
+        self._used = False
+
+    def _claim(self) -> asyncio.Semaphore:
+        if self._used:
+            raise RuntimeError("Generation slot already used")
+        self._used = True
+        return self._semaphore
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking call on this slot.
+
+        The slot stays taken until the SDK call returns, even if the caller
+        times out or is cancelled first, so a slow backend keeps counting
+        against max_in_flight and new work is queued or rejected.
+        """
+        future = self._pool._submit(self._claim(), partial(fn, *args, **kwargs))
+        # Shielded so cancelling the caller doesn't mark the thread's future done
+        return await asyncio.shield(future)
+
+    def stream(self, fn: Callable[..., Iterable[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+        """Drive a blocking iterator on this slot; see GenerationPool.stream."""
+        # The slot is claimed when iteration starts; until then release() still works
+        return self._pool._stream(self, fn, args, kwargs)
+
+    def release(self):
+        """Hand back a slot that was never used."""
+        if not self._used:
+            self._used = True
+            self._pool._free(self._semaphore)
+
+
+class GenerationPool:
+    """
+    Bounded executor for the blocking Granite SDK calls.
+
+    At most ``max_in_flight`` generations run at once per worker; up to
+    ``max_queue`` more wait for a slot for ``queue_timeout`` seconds. Anything
+    beyond that is rejected with GenerationQueueFull so the route can answer
+    503 instead of stalling the event loop. When a Granite quota is configured
+    the rate limiter wait counts against the same timeout.
+
+    admit() reserves a slot separately from running on it, so callers can
+    start per-call deadlines once the call has actually left the local queue.
+    """
+
+    def __init__(self, max_in_flight: int = None, max_queue: int = None,
+                 queue_timeout: float = None, retry_after: int = None):
+        self.max_in_flight = max_in_flight or int(os.getenv("GRANITE_MAX_IN_FLIGHT", "4"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("GRANITE_MAX_QUEUE", "16"))
+        self.queue_timeout = queue_timeout or float(os.getenv("GRANITE_QUEUE_TIMEOUT", "30"))
+        self.retry_after = retry_after or int(os.getenv("GRANITE_RETRY_AFTER", "5"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="granite"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def admit(self, wait: bool = True) -> Optional[GenerationSlot]:
+        """
+        Reserve a slot, waiting in the local queue if needed.
+
+        With wait=False, returns None unless a slot and (when configured)
+        a rate limit token are free right now; used for hedged attempts,
+        which should never queue behind the work they are hedging.
+        """
+        semaphore = self._get_semaphore()
+        if not wait:
+            if semaphore.locked() or self.waiting:
+                return None
+            limiter = get_rate_limiter()
+            if limiter is not None and not await limiter.try_acquire():
+                return None
+            if semaphore.locked():
+                return None
+            await semaphore.acquire()
+            return self._take(semaphore)
+
+        if self.waiting + self.in_flight >= self.max_in_flight + self.max_queue:
+            metrics.event("rejected", "generation_pool")
+            raise GenerationQueueFull("Generation queue is full", self.retry_after)
+
+        self.waiting += 1
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            limiter = get_rate_limiter()
+            if limiter is not None:
+                # Wait for quota before taking a slot, so throttled calls don't hold one
+                with metrics.stage("rate_limit_wait", "generation_pool"):
+                    await asyncio.wait_for(limiter.acquire(), timeout=self.queue_timeout)
+            remaining = deadline - time.monotonic()
+            with metrics.stage("queue_wait", "generation_pool"):
+                if remaining > 0:
+                    await asyncio.wait_for(semaphore.acquire(), timeout=remaining)
+                elif semaphore.locked():
+                    raise asyncio.TimeoutError()
+                else:
+                    await semaphore.acquire()
+        except asyncio.TimeoutError:
+            metrics.event("rejected", "generation_pool")
+            raise GenerationQueueFull("Timed out waiting for a generation slot", self.retry_after)
+        finally:
+            self.waiting -= 1
+        return self._take(semaphore)
+
+    def _take(self, semaphore: asyncio.Semaphore) -> GenerationSlot:
+        self.in_flight += 1
+        return GenerationSlot(self, semaphore)
+
+    def _free(self, semaphore: asyncio.Semaphore):
+        self.in_flight -= 1
+        semaphore.release()
+
+    def _submit(self, semaphore: asyncio.Semaphore, fn: Callable[[], Any]) -> asyncio.Future:
+        """Start fn on a worker thread; the slot is freed when the thread finishes."""
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, fn)
+        except BaseException:
+            self._free(semaphore)
+            raise
+        future.add_done_callback(partial(self._release, semaphore))
+        return future
+
+    def _release(self, semaphore: asyncio.Semaphore, future: asyncio.Future):
+        """Free a slot once its worker thread has actually finished."""
+        self._free(semaphore)
+        if not future.cancelled():
+            future.exception()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call in the pool, waiting for a free slot if needed."""
+        slot = await self.admit()
+        return await slot.run(fn, *args, **kwargs)
+
+    async def stream(self, fn: Callable[..., Iterable[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Drive a blocking iterator in the pool and yield its items as they arrive.
+
+        Once the consumer stops, the producer thread notices after the
+        iterator's next item and exits; the slot is freed only then.
+        """
+        slot = await self.admit()
+        chunks = slot.stream(fn, *args, **kwargs)
+        try:
+            async for item in chunks:
+                yield item
+        finally:
+            slot.release()
+            await chunks.aclose()
+
+    async def _stream(self, slot: GenerationSlot, fn: Callable[..., Iterable[Any]],
+                      args: tuple, kwargs: dict) -> AsyncIterator[Any]:
+        semaphore = slot._claim()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        stopped = False
+
+        def produce():
+            try:
+                for item in fn(*args, **kwargs):
+                    if stopped:
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (done, e))
+                return
+            loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+        self._submit(semaphore, produce)
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    break
+                yield item
+        finally:
+            stopped = True
+
+    def shutdown(self):
+        """Stop accepting work and release the worker threads."""
+        self._executor.shutdown(wait=False)
+
+
+_pool: Optional[GenerationPool] = None
+
+def get_generation_pool() -> GenerationPool:
+    """Return the per-process generation pool."""
+    global _pool
+    if _pool is None:
+        _pool = GenerationPool()
+    return _pool
+
+def shutdown_generation_pool():
+    """Shut down and drop the per-process generation pool."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
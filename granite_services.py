@@ -1,116 +1,307 @@
 import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from ibm_watson_machine_learning import APIClient
-from sentence_transformers import SentenceTransformer
-import numpy as np
+import os
+from typing import List, Dict, Any, Optional, Tuple
 from app.core.config import settings
+from generation_pool import GenerationQueueFull, get_generation_pool
+from single_flight import SingleFlight
+from metrics import metrics
+from resilience import CircuitOpen, get_resilient_caller
+from json_extract import JsonObjectScanner, extract_json_object, loads_tolerant
+from prompt_templates import max_new_tokens_for, render_prompt
+from response_cache import normalize_input
 
 logger = logging.getLogger(__name__)
 
+# Structured output for match analysis. The prompt ends inside the object so
+# the model continues it directly, and generation stops at the closing brace.
+MATCH_ANALYSIS_PREFIX = '{"match_score":'
+MATCH_ANALYSIS_PARAMS = {
+    "max_new_tokens": max_new_tokens_for("match_analysis"),
+    "temperature": 0.2,
+    "stop_sequences": ["}"],
+    "include_stop_sequence": True
+}
+
+# Returned by _generate_text when the model call fails
+GENERATION_UNAVAILABLE = "AI generation temporarily unavailable. Please try again later."
+
+class GenerationFailed(Exception):
+    """Raised instead of returning fallback text when the caller wants to retry"""
+
 class GraniteService:
     def __init__(self):
         self.client = None
         self.embedding_model = None
+        self.embeddings = None
+        self.job_index = None
+        self.job_store = None
+        self.job_field_stores: Dict[str, Any] = {}
+        self.match_features = None
+        self._jobs: Dict[Any, Dict[str, Any]] = {}
+        # Indexed jobs whose match features are built on first use
+        self._features_pending = set()
+        # Store rows shadowed by the in-memory index or removed since warm start
+        self._store_excluded = set()
         self.is_ready = False
+        self.client_ready = False
+        self.embeddings_ready = False
+        self.component_errors: Dict[str, str] = {}
+        self._warmup: Optional[asyncio.Task] = None
+        self._client_task: Optional[asyncio.Task] = None
+        self._embedding_task: Optional[asyncio.Task] = None
+        self._flights = SingleFlight()
+        self._resilience = get_resilient_caller("watsonx", ignore=(GenerationQueueFull,))
+        self.semantic_cache_enabled = bool(getattr(settings, 'SEMANTIC_CACHE_ENABLED', False))
+        self.semantic_cache = None
+        # Overall time budget (seconds) for a store job posting
+        self.generation_deadline = float(getattr(settings, 'GRANITE_GENERATION_DEADLINE', 45.0))
         
+    def start(self) -> asyncio.Task:
+        """
+        Begin background warmup without blocking the caller.
+
+        The Watson client and the embedding model are set up concurrently in
+        worker threads; routes can check client_ready / embeddings_ready and
+        serve as soon as the part they need is available.
+        """
+        if self._warmup is None:
+            self._client_task = asyncio.ensure_future(self._run_blocking(self._init_client, "client"))
+            if self.embeddings_ready:
+                # Already loaded before the worker was forked
+                self._embedding_task = asyncio.ensure_future(asyncio.sleep(0))
+            else:
+                self._embedding_task = asyncio.ensure_future(self._run_blocking(self._init_embeddings, "embeddings"))
+            self._warmup = asyncio.ensure_future(self._finish_warmup())
+        return self._warmup
+    
     async def initialize(self):
         """Initialize IBM Watson ML client and embedding model"""
+        await self.start()
+    
+    async def _finish_warmup(self):
+        await asyncio.gather(self._client_task, self._embedding_task)
+        self.is_ready = self.client_ready and self.embeddings_ready
+        if self.is_ready:
+            logger.info("Granite service initialized successfully")
+    
+    async def _run_blocking(self, fn, component: str):
+        loop = asyncio.get_running_loop()
         try:
-            # Initialize IBM Watson ML client
-            wml_credentials = {
-                "url": settings.IBM_URL,
-                "apikey": settings.IBM_API_KEY
+            await loop.run_in_executor(None, fn)
+            self.component_errors.pop(component, None)
+        except Exception as e:
+            logger.error(f"Failed to initialize Granite service {component}: {str(e)}")
+            self.component_errors[component] = str(e)
+    
+    def _init_client(self):
+        """Initialize IBM Watson ML client"""
+        # Deferred: the WML SDK is slow to import and not every route needs it
+        from ibm_watson_machine_learning import APIClient
+        
+        wml_credentials = {
+            "url": settings.IBM_URL,
+            "apikey": settings.IBM_API_KEY
+        }
+        
+        client = APIClient(wml_credentials)
+        
+        if settings.IBM_SPACE_ID:
+            client.set.default_space(settings.IBM_SPACE_ID)
+        elif settings.IBM_PROJECT_ID:
+            client.set.default_project(settings.IBM_PROJECT_ID)
+        
+        self.client = client
+        self.client_ready = True
+    
+    def _init_embeddings(self):
+        """Load the sentence transformer and the job ranking structures"""
+        # Deferred: torch/sentence-transformers dominate import time
+        from sentence_transformers import SentenceTransformer
+        from embedding_engine import EmbeddingEngine
+        from job_index import JobIndex
+        from embedding_store import EmbeddingStore
+        from match_features import FIELDS, MatchFeatureIndex
+        
+        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embeddings = EmbeddingEngine(self.embedding_model)
+        self.job_index = JobIndex(self.embeddings.dimension)
+        self.match_features = MatchFeatureIndex(self.embeddings.dimension)
+        
+        store_dir = getattr(settings, 'JOB_EMBEDDING_STORE_DIR', None)
+        if store_dir:
+            self.job_store = EmbeddingStore(
+                store_dir,
+                self.embeddings.dimension,
+                quantize=bool(getattr(settings, 'JOB_EMBEDDING_QUANTIZE', False))
+            )
+            self.job_store.load()
+            # Per-field match feature vectors live next to the ranking vectors
+            self.job_field_stores = {
+                field: EmbeddingStore(
+                    os.path.join(store_dir, f"field-{field}"),
+                    self.embeddings.dimension,
+                    quantize=self.job_store.quantize
+                )
+                for field in FIELDS
             }
-            
-            self.client = APIClient(wml_credentials)
-            
-            if settings.IBM_SPACE_ID:
-                self.client.set.default_space(settings.IBM_SPACE_ID)
-            elif settings.IBM_PROJECT_ID:
-                self.client.set.default_project(settings.IBM_PROJECT_ID)
-            
-            # Initialize sentence transformer for embeddings
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            
-            self.is_ready = True
-            logger.info("Granite service initialized successfully")
-            
+        
+        if self.semantic_cache_enabled:
+            from semantic_cache import SemanticCache
+            self.semantic_cache = SemanticCache(
+                "smart_job_description", self.embed_text, self.embeddings.dimension
+            )
+        
+        self.embeddings_ready = True
+    
+    async def embed_text(self, text: str):
+        """Normalized embedding of text, or None while the model is loading"""
+        if not self.embeddings_ready:
+            return None
+        return await self.embeddings.encode_one(text)
+    
+    def preload_embeddings(self):
+        """
+        Load the embedding model synchronously in a pre-fork master process.
+
+        Forked workers then share the model's weight pages copy-on-write.
+        The Watson client is not preloaded: its HTTP sessions must not be
+        shared across a fork.
+        """
+        try:
+            self._init_embeddings()
         except Exception as e:
-            logger.error(f"Failed to initialize Granite service: {str(e)}")
-            self.is_ready = False
+            logger.error(f"Failed to preload embedding model: {str(e)}")
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness of each component, for health checks"""
+        return {
+            'ready': self.is_ready,
+            'client_ready': self.client_ready,
+            'embeddings_ready': self.embeddings_ready,
+            'errors': dict(self.component_errors)
+        }
     
     async def cleanup(self):
         """Cleanup resources"""
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
         self.is_ready = False
         logger.info("Granite service cleaned up")
     
-    async def generate_store_job_description(self, store_job_input: Dict[str, Any]) -> Dict[str, str]:
+    async def generate_store_job_description(self, store_job_input: Dict[str, Any],
+                                             allow_fallback: bool = True) -> Dict[str, str]:
         """
         Generate a professional job description for store owners using IBM Granite 3.3
+
+        The description and summary are generated in parallel under one
+        deadline; each falls back on its own if it fails or runs out of time.
+        With allow_fallback=False a fallback raises GenerationFailed instead
+        (or GenerationQueueFull when the pool turned the work away), so batch
+        callers can retry. Concurrent calls with identical input
+        share a single generation.
         """
+        key = hashlib.sha256(
+            json.dumps(store_job_input, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        result, fallbacks, rejection = await self._flights.do(
+            key, lambda: self._generate_store_job_description(store_job_input)
+        )
+        if fallbacks and not allow_fallback:
+            if rejection is not None:
+                raise rejection
+            raise GenerationFailed(f"Store job {' and '.join(fallbacks)} could not be generated")
+        # Callers may mutate their result; don't let that leak to the others
+        return dict(result)
+
+    async def _generate_store_job_description(self, store_job_input: Dict[str, Any],
+                                              deadline: Optional[float] = None
+                                              ) -> Tuple[Dict[str, str], List[str], Optional[GenerationQueueFull]]:
+        rejection = None
         try:
             # Create a structured prompt for store job posting
-            prompt = f"""
-            You are a professional job posting writer. Create a clear, complete, and industry-appropriate job description for a local store/business based on the following information:
-
-            Job Title: {store_job_input.get('job_title', '')}
-            Store/Business: {store_job_input.get('store_name', '')}
-            Location: {store_job_input.get('location', '')}
-            Key Responsibilities: {store_job_input.get('key_responsibilities', 'Not specified')}
-            Skills Required: {store_job_input.get('skills_required', 'Not specified')}
-            Working Hours: {store_job_input.get('working_hours', 'Not specified')}
-            Working Days: {store_job_input.get('working_days', 'Not specified')}
-            Salary: {store_job_input.get('salary', 'Competitive salary')}
-            Job Type: {store_job_input.get('job_type', 'Full-time')}
-            Contact Info: {store_job_input.get('contact_info', 'Apply in person')}
-            Additional Info: {store_job_input.get('additional_info', '')}
-
-            Create a professional job posting that includes:
-            1. A clear job title and company name
-            2. Job overview and main responsibilities
-            3. Required skills and qualifications
-            4. Working hours and schedule
-            5. Salary information
-            6. Location details
-            7. How to apply
-
-            Format it as a complete, ready-to-post job description that would attract suitable candidates for a local store position.
-            Make it professional but accessible, suitable for local job seekers.
-            """
-            
-            # Generate the job description
-            enhanced_description = await self._generate_text(prompt)
+            fields = self._store_job_fields(store_job_input)
+            prompt, description_params = render_prompt("store_job_description", **fields)
             
-            # Generate a summary
-            summary_prompt = f"""
-            Create a brief, engaging summary (1-2 sentences) for this job posting:
+            # The summary is written from the structured input rather than the
+            # finished description, so both generations can run side by side
+            summary_prompt, summary_params = render_prompt("store_job_summary", **fields)
             
-            {enhanced_description}
-            
-            The summary should highlight the key role, location, and main appeal to job seekers.
-            Keep it under 100 words and make it attractive for mobile job browsing.
-            """
-            
-            summary = await self._generate_text(summary_prompt)
-            
-            # Create a formatted job post
-            formatted_post = self._format_job_post(store_job_input, enhanced_description)
-            
-            return {
-                'enhanced_description': enhanced_description,
-                'summary': summary,
-                'formatted_post': formatted_post
-            }
+            description_task = asyncio.ensure_future(self._generate_text(prompt, description_params))
+            summary_task = asyncio.ensure_future(self._generate_text(summary_prompt, summary_params))
             
+            # Both generations share one overall deadline
+            deadline = deadline if deadline is not None else self.generation_deadline
+            done, pending = await asyncio.wait(
+                [description_task, summary_task], timeout=deadline
+            )
+            for task in pending:
+                task.cancel()
+            
+            enhanced_description = self._task_text(description_task, done, "description")
+            summary = self._task_text(summary_task, done, "summary")
+            # Note a local rejection so callers can defer rather than fail
+            for task in done:
+                if isinstance(task.exception(), GenerationQueueFull):
+                    rejection = task.exception()
         except Exception as e:
             logger.error(f"Error generating store job description: {str(e)}")
-            return {
-                'enhanced_description': self._create_fallback_description(store_job_input),
-                'summary': f"{store_job_input.get('job_title', 'Job')} position available at {store_job_input.get('store_name', 'local store')}",
-                'formatted_post': self._create_fallback_description(store_job_input)
-            }
+            enhanced_description = summary = None
+        
+        # Fall back per field instead of failing the whole posting
+        fallbacks = []
+        if enhanced_description is None:
+            fallbacks.append('description')
+            enhanced_description = self._create_fallback_description(store_job_input)
+            formatted_post = enhanced_description
+        else:
+            formatted_post = self._format_job_post(store_job_input, enhanced_description)
+        
+        if summary is None:
+            fallbacks.append('summary')
+            summary = self._create_fallback_summary(store_job_input)
+        
+        return {
+            'enhanced_description': enhanced_description,
+            'summary': summary,
+            'formatted_post': formatted_post
+        }, fallbacks, rejection
+    
+    def _task_text(self, task: asyncio.Future, done: set, field: str) -> Optional[str]:
+        """Return a finished generation's text, or None if it timed out, failed or fell back"""
+        if task not in done:
+            logger.warning(f"Store job {field} generation missed the deadline")
+            return None
+        if task.exception() is not None:
+            logger.error(f"Error generating store job {field}: {str(task.exception())}")
+            return None
+        text = task.result()
+        if not text or text == GENERATION_UNAVAILABLE:
+            return None
+        return text
+    
+    def _create_fallback_summary(self, input_data: Dict[str, Any]) -> str:
+        """Create a one-line summary when AI is unavailable"""
+        return f"{input_data.get('job_title', 'Job')} position available at {input_data.get('store_name', 'local store')}"
+    
+    def _store_job_fields(self, store_job_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Store job prompt fields with the defaults used for missing values"""
+        defaults = {
+            'job_title': '',
+            'store_name': '',
+            'location': '',
+            'key_responsibilities': 'Not specified',
+            'skills_required': 'Not specified',
+            'working_hours': 'Not specified',
+            'working_days': 'Not specified',
+            'salary': 'Competitive salary',
+            'job_type': 'Full-time',
+            'contact_info': 'Apply in person',
+            'additional_info': ''
+        }
+        return {key: store_job_input.get(key, default) for key, default in defaults.items()}
     
     def _format_job_post(self, input_data: Dict[str, Any], ai_description: str) -> str:
         """Format the job post in a structured, mobile-friendly way"""
@@ -165,30 +356,24 @@ We are looking for a {input_data.get('job_title', 'team member')} to join our te
         Generate an enhanced job description using IBM Granite 3.3
         """
         try:
-            prompt = f"""
-            Create a comprehensive and engaging job description based on the following information:
-            
-            Job Title: {job_data.get('title', '')}
-            Company: {job_data.get('company', '')}
-            Location: {job_data.get('location', '')}
-            Basic Description: {job_data.get('description', '')}
-            Requirements: {job_data.get('requirements', '')}
-            Experience Level: {job_data.get('experience_level', '')}
-            Job Type: {job_data.get('job_type', '')}
-            
-            Please create a professional, detailed job description that includes:
-            1. An engaging overview of the role
-            2. Key responsibilities
-            3. Required qualifications
-            4. Preferred qualifications
-            5. What the company offers
-            6. Growth opportunities
-            
-            Make it attractive to potential candidates while being clear about expectations.
-            """
+            fields = {key: job_data.get(key, '') for key in (
+                'title', 'company', 'location', 'description',
+                'requirements', 'experience_level', 'job_type'
+            )}
+            prompt, params = render_prompt("smart_job_description", **fields)
+            
+            # Near-duplicate inputs reuse an earlier generation
+            semantic_key = None
+            if self.semantic_cache is not None:
+                semantic_key = " | ".join(f"{key}: {normalize_input(str(value))}" for key, value in fields.items())
+                cached = await self.semantic_cache.lookup(semantic_key)
+                if cached is not None:
+                    return cached
             
             # Generate using IBM Granite
-            response = await self._generate_text(prompt)
+            response = await self._generate_text(prompt, params)
+            if semantic_key is not None and response != GENERATION_UNAVAILABLE:
+                await self.semantic_cache.add(semantic_key, response)
             return response
             
         except Exception as e:
@@ -200,19 +385,10 @@ We are looking for a {input_data.get('job_title', 'team member')} to join our te
         Generate an AI-powered job summary using IBM Granite 3.3
         """
         try:
-            prompt = f"""
-            Create a concise, engaging summary (2-3 sentences) of the following job description:
-            
-            {job_description}
+            # Long descriptions are trimmed to the summary prompt's input budget
+            prompt, params = render_prompt("job_summary", job_description=job_description)
             
-            The summary should:
-            1. Highlight the key role and main responsibilities
-            2. Mention the most important qualifications
-            3. Be appealing to job seekers
-            4. Be under 150 words
-            """
-            
-            response = await self._generate_text(prompt)
+            response = await self._generate_text(prompt, params)
             return response
             
         except Exception as e:
@@ -228,44 +404,27 @@ We are looking for a {input_data.get('job_title', 'team member')} to join our te
             user_text = self._create_user_profile_text(user_profile)
             job_text = self._create_job_text(job_data)
             
-            user_embedding = self.embedding_model.encode([user_text])
-            job_embedding = self.embedding_model.encode([job_text])
+            user_embedding, job_embedding = await self.embeddings.encode([user_text, job_text])
             
-            # Calculate cosine similarity
-            similarity = np.dot(user_embedding[0], job_embedding[0]) / (
-                np.linalg.norm(user_embedding[0]) * np.linalg.norm(job_embedding[0])
-            )
+            # Embeddings are pre-normalized, so cosine similarity is a dot product
+            similarity = user_embedding @ job_embedding
             
             # Convert to percentage
             base_score = float(similarity) * 100
             
             # Use Granite for detailed analysis
-            analysis_prompt = f"""
-            Analyze the job match between this candidate and job posting:
-            
-            CANDIDATE PROFILE:
-            {user_text}
-            
-            JOB POSTING:
-            {job_text}
-            
-            Provide a detailed analysis including:
-            1. Overall match percentage (0-100)
-            2. Strengths (what matches well)
-            3. Gaps (what's missing)
-            4. Recommendations for the candidate
-            
-            Format as JSON with keys: match_score, strengths, gaps, recommendations
-            """
+            analysis_prompt, _ = render_prompt(
+                "match_analysis", user_text=user_text, job_text=job_text, prefix=MATCH_ANALYSIS_PREFIX
+            )
             
-            analysis = await self._generate_text(analysis_prompt)
+            detailed_analysis = await self._generate_json(analysis_prompt, MATCH_ANALYSIS_PREFIX)
             
-            try:
-                # Try to parse as JSON
-                detailed_analysis = json.loads(analysis)
-                match_score = detailed_analysis.get('match_score', base_score)
-            except:
-                # Fallback to base score if JSON parsing fails
+            if detailed_analysis is not None:
+                detailed_analysis = self._coerce_match_analysis(detailed_analysis, base_score)
+                match_score = detailed_analysis['match_score']
+            else:
+                # Fallback to base score if no JSON could be recovered
+                metrics.event("json_parse_failed", "granite_service")
                 match_score = base_score
                 detailed_analysis = {
                     'match_score': match_score,
@@ -291,41 +450,323 @@ We are looking for a {input_data.get('job_title', 'team member')} to join our te
                 }
             }
     
-    async def _generate_text(self, prompt: str) -> str:
+    def _coerce_match_analysis(self, analysis: Dict[str, Any], base_score: float) -> Dict[str, Any]:
+        """Fill in missing keys and normalize types of a parsed match analysis"""
+        try:
+            match_score = float(analysis.get('match_score', base_score))
+        except (TypeError, ValueError):
+            match_score = base_score
+        
+        coerced = {'match_score': min(100.0, max(0.0, match_score))}
+        for key in ('strengths', 'gaps', 'recommendations'):
+            value = analysis.get(key) or []
+            if isinstance(value, str):
+                value = [value]
+            coerced[key] = [str(item) for item in value]
+        return coerced
+    
+    async def _generate_json(self, prompt: str, prefix: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Generate a JSON object and recover it from the model output.
+
+        When the SDK can stream, generation is abandoned as soon as the
+        object's closing brace arrives; otherwise a '}' stop sequence keeps
+        the model from running on past the object.
+        """
+        stream = getattr(getattr(self.client, 'foundation_models', None), 'generate_text_stream', None)
+        if stream is not None and not settings.GRANITE_DEPLOYMENT_ID and self._resilience.breaker.state == "closed":
+            params = dict(self._generation_params(), **MATCH_ANALYSIS_PARAMS)
+            params.pop('stop_sequences')
+            scanners: List[JsonObjectScanner] = []
+            
+            async def read_object(slot) -> JsonObjectScanner:
+                # One scanner per attempt, since a hedged call may run two at once
+                scanner = JsonObjectScanner()
+                scanner.feed(prefix)
+                scanners.append(scanner)
+                chunks = slot.stream(
+                    stream, model_id=settings.GRANITE_MODEL_ID, prompt=prompt, params=params
+                )
+                # Closing the stream once the object is complete tells the producer
+                # to stop; it notices after the SDK yields its next chunk, and the
+                # pool slot is freed when that thread exits
+                try:
+                    async for chunk in chunks:
+                        if scanner.feed(chunk if isinstance(chunk, str) else str(chunk)) is not None:
+                            break
+                finally:
+                    await chunks.aclose()
+                return scanner
+            
+            try:
+                with metrics.stage("generate_json", "granite_service"):
+                    scanner = await self._resilience.call(read_object, admit=get_generation_pool().admit)
+            except GenerationQueueFull:
+                raise
+            except Exception as e:
+                metrics.event("generate_failed", "granite_service")
+                logger.error(f"Error streaming JSON from Granite: {str(e)}")
+                if not scanners:
+                    return None
+                scanner = scanners[0]
+            source, text = scanner.result, scanner.text
+        else:
+            output = await self._generate_text(prompt, MATCH_ANALYSIS_PARAMS)
+            if output == GENERATION_UNAVAILABLE:
+                return None
+            source, text = None, prefix + output
+        
+        with metrics.stage("json_loads", "granite_service"):
+            value = loads_tolerant(source) if source else None
+            if not isinstance(value, dict):
+                value = extract_json_object(text)
+        return value
+    
+    async def index_jobs(self, jobs: List[Dict[str, Any]]) -> int:
+        """
+        Add or update jobs in the ranking index. Each job needs an 'id';
+        ids are stored as strings. Match features for these jobs are built
+        the first time they are scored.
+        """
+        jobs = [job for job in jobs if job.get('id') is not None]
+        if not jobs:
+            return 0
+        vectors = await self.embeddings.encode([self._create_job_text(job) for job in jobs])
+        job_ids = [str(job['id']) for job in jobs]
+        self.job_index.add_many(job_ids, vectors)
+        for job_id, job in zip(job_ids, jobs):
+            self._jobs[job_id] = job
+            self._features_pending.add(job_id)
+            if self.job_store is not None and job_id in self.job_store:
+                self._store_excluded.add(job_id)
+        return len(jobs)
+    
+    def remove_job(self, job_id: Any) -> bool:
+        """Remove a job from the ranking index"""
+        job_id = str(job_id)
+        self._jobs.pop(job_id, None)
+        self._features_pending.discard(job_id)
+        self.match_features.jobs.remove(job_id)
+        if self.job_store is not None and job_id in self.job_store:
+            self._store_excluded.add(job_id)
+            self.job_index.remove(job_id)
+            return True
+        return self.job_index.remove(job_id)
+    
+    async def warm_start_jobs(self, jobs: List[Dict[str, Any]]) -> int:
+        """
+        Load the full job catalog into the persistent embedding store.
+
+        Only jobs whose text changed since the last sync are re-encoded, for
+        both the ranking vectors and the per-field match features. Jobs
+        missing from the catalog are dropped. Without a configured store this
+        falls back to index_jobs. Returns the number of jobs encoded.
+        """
+        if self.job_store is None:
+            return await self.index_jobs(jobs)
+        
+        catalog = {str(job['id']): job for job in jobs if job.get('id') is not None}
+        texts = {job_id: self._create_job_text(job) for job_id, job in catalog.items()}
+        loop = asyncio.get_running_loop()
+        encoded = await loop.run_in_executor(
+            None, self.job_store.sync, texts, self.embeddings.encode_blocking
+        )
+        field_encoder = await loop.run_in_executor(None, self._sync_job_fields, catalog)
+        await loop.run_in_executor(None, self.match_features.jobs.upsert, catalog, field_encoder)
+        
+        # The store is now authoritative for the whole catalog; jobs added
+        # through index_jobs and not in the catalog stay in the memory index
+        for job_id in catalog:
+            self.job_index.remove(job_id)
+            self._features_pending.discard(job_id)
+        dropped = [job_id for job_id in self._jobs if job_id not in catalog and job_id not in self.job_index]
+        for job_id in dropped:
+            del self._jobs[job_id]
+            self._features_pending.discard(job_id)
+            self.match_features.jobs.remove(job_id)
+        self._jobs.update(catalog)
+        self._store_excluded.clear()
+        return encoded
+    
+    def _sync_job_fields(self, catalog: Dict[str, Dict[str, Any]]):
+        """
+        Sync the per-field stores and return an encoder that serves their
+        vectors, falling back to the model for texts not in a store.
+        """
+        from embedding_store import content_hash
+        from match_features import job_fields
+        
+        stored = {}
+        field_texts = {job_id: job_fields(job) for job_id, job in catalog.items()}
+        for field, store in self.job_field_stores.items():
+            texts = {job_id: fields[field] for job_id, fields in field_texts.items() if fields[field]}
+            store.sync(texts, self.embeddings.encode_blocking)
+            for job_id, text in texts.items():
+                stored.setdefault(content_hash(text), (store, job_id))
+        
+        def encode(batch: List[str]):
+            vectors = [None] * len(batch)
+            missing = []
+            for i, text in enumerate(batch):
+                ref = stored.get(content_hash(text))
+                vector = ref[0].vector(ref[1]) if ref is not None else None
+                if vector is None:
+                    missing.append(i)
+                else:
+                    vectors[i] = vector
+            if missing:
+                for i, vector in zip(missing, self.embeddings.encode_blocking([batch[i] for i in missing])):
+                    vectors[i] = vector
+            return vectors
+        
+        return encode
+    
+    async def update_candidates(self, profiles: List[Dict[str, Any]]) -> int:
+        """
+        Add or update candidate profiles in the match feature index.
+
+        Each profile needs an 'id'; only fields whose text changed are
+        re-encoded. Returns the number of field texts encoded.
+        """
+        items = {str(p['id']): p for p in profiles if p.get('id') is not None}
+        return await self._upsert_features(self.match_features.candidates, items)
+    
+    def remove_candidate(self, user_id: Any) -> bool:
+        """Remove a candidate from the match feature index"""
+        return self.match_features.candidates.remove(str(user_id))
+    
+    async def score_matches(self, user_ids: List[Any], job_ids: Optional[List[Any]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Feature-based match scores (0-100) for candidates against jobs.
+
+        Uses the precomputed per-field embeddings, skill-set overlap and
+        experience fit; no LLM call is made. Defaults to all indexed jobs.
+        """
+        features = self.match_features
+        requested = None if job_ids is None else [str(j) for j in job_ids]
+        pending = self._features_pending if requested is None else self._features_pending.intersection(requested)
+        if pending:
+            build = {job_id: self._jobs[job_id] for job_id in pending if job_id in self._jobs}
+            self._features_pending.difference_update(build)
+            try:
+                await self._upsert_features(features.jobs, build)
+            except BaseException:
+                self._features_pending.update(job_id for job_id in build if job_id in self._jobs)
+                raise
+        
+        user_ids = [str(u) for u in user_ids if str(u) in features.candidates.records]
+        job_ids = [j for j in requested if j in features.jobs.records] if requested is not None else list(features.jobs.ids)
+        if not user_ids or not job_ids:
+            return {}
+        scores = features.score(features.candidates.rows(user_ids), features.jobs.rows(job_ids))
+        return {
+            user_id: {job_id: float(score) for job_id, score in zip(job_ids, row)}
+            for user_id, row in zip(user_ids, scores)
+        }
+    
+    async def _upsert_features(self, side, items: Dict[str, Dict[str, Any]]) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, side.upsert, items, self.embeddings.encode_blocking)
+    
+    async def rank_jobs(self, user_profile: Dict[str, Any], k: int = 10, analyze: int = 0) -> List[Dict[str, Any]]:
+        """
+        Rank indexed jobs for a candidate by embedding similarity.
+
+        Only the top ``analyze`` results of the shortlist get the full Granite
+        match analysis, and only when the job's body is known.
+        """
+        user_text = self._create_user_profile_text(user_profile)
+        query = await self.embeddings.encode_one(user_text)
+        shortlist = self.job_index.search(query, k)
+        if self.job_store is not None:
+            shortlist += self.job_store.search(query, k, exclude=self._store_excluded)
+            shortlist = sorted(shortlist, key=lambda item: -item[1])[:k]
+        
+        results = [
+            {
+                'job_id': job_id,
+                'match_score': min(100.0, max(0.0, score * 100)),
+                'job': self._jobs.get(job_id)
+            }
+            for job_id, score in shortlist
+        ]
+        
+        if analyze > 0:
+            # Store hits from before a restart have no body until the catalog
+            # is synced again; analyzing an empty job would only yield the fallback
+            to_analyze = [result for result in results[:analyze] if result['job'] is not None]
+            analyses = await asyncio.gather(*[
+                self.calculate_job_match_score(user_profile, result['job'])
+                for result in to_analyze
+            ])
+            for result, analysis in zip(to_analyze, analyses):
+                result['analysis'] = analysis['analysis']
+        
+        return results
+    
+    def _generation_params(self) -> Dict[str, Any]:
+        """Default sampling parameters for Granite generations"""
+        return {
+            "max_new_tokens": 800,
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "repetition_penalty": 1.1
+        }
+    
+    async def _generate_text(self, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate text using IBM Granite model
+
+        ``params`` overrides individual default generation parameters.
         """
         try:
+            # Requests that arrive during warmup wait for the client only
+            if not self.client_ready and self._client_task is not None:
+                await asyncio.shield(self._client_task)
+            
             # Prepare the generation parameters
-            generation_params = {
-                "max_new_tokens": 800,
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "repetition_penalty": 1.1
-            }
+            generation_params = self._generation_params()
+            if params:
+                generation_params.update(params)
             
-            # Generate text using the model
+            # Generate text using the model, off the event loop
             if settings.GRANITE_DEPLOYMENT_ID:
                 # Use deployment if available
-                response = self.client.deployments.generate_text(
+                call = lambda slot: slot.run(
+                    self.client.deployments.generate_text,
                     deployment_id=settings.GRANITE_DEPLOYMENT_ID,
                     prompt=prompt,
                     params=generation_params
                 )
             else:
                 # Use foundation model directly
-                response = self.client.foundation_models.generate_text(
+                call = lambda slot: slot.run(
+                    self.client.foundation_models.generate_text,
                     model_id=settings.GRANITE_MODEL_ID,
                     prompt=prompt,
                     params=generation_params
                 )
             
-            return response.get('results', [{}])[0].get('generated_text', '').strip()
-            
+            # Fails fast while the backend is unhealthy; the deadline starts
+            # once a pool slot is ours, so local queueing never trips the breaker
+            with metrics.stage("generate_text", "granite_service"):
+                response = await self._resilience.call(call, admit=get_generation_pool().admit)
+            
+            result = response.get('results', [{}])[0]
+            text = result.get('generated_text', '').strip()
+            tokens = result.get('generated_token_count')
+            metrics.tokens.inc(tokens if tokens is not None else len(text.split()), "granite_service")
+            return text
+            
+        except GenerationQueueFull:
+            raise
+        except CircuitOpen:
+            return GENERATION_UNAVAILABLE
         except Exception as e:
+            metrics.event("generate_failed", "granite_service")
             logger.error(f"Error generating text with Granite: {str(e)}")
             # Fallback to a simple response
-            return "AI generation temporarily unavailable. Please try again later."
+            return GENERATION_UNAVAILABLE
     
     def _create_user_profile_text(self, user_profile: Dict[str, Any]) -> str:
         """Create a text representation of user profile for embedding"""
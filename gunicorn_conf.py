@@ -0,0 +1,27 @@
+"""
+Production server config: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn_conf.py main:app
+
+The app is imported once in the master (preload_app) with PRELOAD_MODELS set,
+so the embedding model is loaded before fork and shared copy-on-write. The
+response cache, rate limiter and job queue use SQLite files under STATE_DIR
+so all workers share one cache and one Granite quota.
+"""
+import multiprocessing
+import os
+
+# Must be set before main is imported: importing it loads the model
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+from main import configure_shared_state
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+configure_shared_state(os.getenv("STATE_DIR", ".state"))
@@ -1,11 +1,31 @@
+import asyncio
+import hashlib
+import html
+import logging
 import os
+import re
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional
+
+import httpx
 from ibm_generative_ai import GenerativeModel, Credentials
 
 from dotenv import load_dotenv
+from generation_pool import GenerationQueueFull, get_generation_pool
+from response_cache import get_response_cache, make_cache_key, normalize_input
+from single_flight import SingleFlight
+from metrics import metrics, count_tokens
+from resilience import CircuitOpen, get_resilient_caller
+from prompt_templates import max_new_tokens_for, render_prompt, template_fingerprint
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+GRANITE_MODEL_ID = "ibm/granite-13b-instruct-v1"
+
 def get_ibm_credentials():
     """Get IBM credentials from environment variables."""
     api_key = os.getenv("IBM_API_KEY")
@@ -16,7 +36,125 @@ def get_ibm_credentials():
     
     return Credentials(api_key=api_key, project_id=project_id)
 
-async def generate_job_description(role: str, skills: str, hours: str) -> str:
+class ModelRegistry:
+    """
+    App-lifetime holder for the Granite credentials, model and HTTP transport.
+
+    Created once in the FastAPI lifespan hook so every request reuses the same
+    model object. The pooled httpx transport is only used when the SDK model
+    exposes an httpx.Client we can swap in; ``transport_attached`` records
+    whether it did, and a warning is logged when it didn't.
+    """
+
+    def __init__(self, max_connections: int = None, max_keepalive: int = None):
+        self.max_connections = max_connections or int(os.getenv("IBM_MAX_CONNECTIONS", "20"))
+        self.max_keepalive = max_keepalive or int(os.getenv("IBM_MAX_KEEPALIVE", "10"))
+        self.credentials = None
+        self.http_client = None
+        self.transport_attached: Optional[bool] = None
+        self._models = {}
+
+    def start(self):
+        """Create the credentials and the pooled HTTP transport."""
+        with metrics.stage("credentials", "ibm_utils"):
+            self.credentials = get_ibm_credentials()
+            self.http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0)
+            )
+
+    def get_model(self, model_id: str = GRANITE_MODEL_ID) -> GenerativeModel:
+        """Return the shared model for model_id, creating it on first use."""
+        if self.credentials is None:
+            self.start()
+        model = self._models.get(model_id)
+        if model is None:
+            model = GenerativeModel(model_id=model_id, credentials=self.credentials)
+            self._attach_transport(model)
+            self._models[model_id] = model
+        return model
+
+    def _attach_transport(self, model: GenerativeModel):
+        """Route the SDK through our pooled transport if it exposes an httpx client."""
+        if isinstance(getattr(model, "client", None), httpx.Client):
+            model.client = self.http_client
+            self.transport_attached = True
+            return
+        if self.transport_attached is None:
+            logger.warning(
+                "Granite SDK model exposes no httpx client; IBM_MAX_CONNECTIONS/IBM_MAX_KEEPALIVE "
+                "are not applied and the SDK manages its own connections"
+            )
+        self.transport_attached = False
+
+    def close(self):
+        """Release pooled connections."""
+        if self.http_client is not None:
+            self.http_client.close()
+            self.http_client = None
+        self._models.clear()
+        self.credentials = None
+
+_registry: Optional[ModelRegistry] = None
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry, creating it if needed."""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+def close_model_registry():
+    """Close and drop the process-wide model registry."""
+    global _registry
+    if _registry is not None:
+        _registry.close()
+        _registry = None
+
+# Sampling parameters for job description generation
+GENERATION_PARAMS = {
+    "max_new_tokens": max_new_tokens_for("job_description"),  # Sized for a detailed job description
+    "temperature": 0.7,        # Balanced between creativity and consistency
+    "top_p": 0.9,              # Allow some diversity in responses
+    "repetition_penalty": 1.1  # Slightly penalize repetition
+}
+
+def build_job_prompt(role: str, skills: str, hours: str) -> str:
+    """Construct the Granite prompt for a store job description."""
+    prompt, _ = render_prompt("job_description", role=role, skills=skills, hours=hours)
+    return prompt
+
+# Coalesces concurrent identical generations onto one model call
+_job_flights = SingleFlight()
+
+# Optional near-duplicate cache, installed by the app when embeddings exist
+_semantic_cache = None
+
+def set_semantic_cache(cache) -> None:
+    """Install (or with None, remove) the semantic cache for job descriptions."""
+    global _semantic_cache
+    _semantic_cache = cache
+
+def semantic_input_text(role: str, skills: str, hours: str) -> str:
+    """Normalized input text that the semantic cache embeds."""
+    return f"role: {normalize_input(role)} | skills: {normalize_input(skills)} | hours: {normalize_input(hours)}"
+
+# Circuit breaker, deadline and hedging around the Granite generate call
+_resilience = get_resilient_caller("ibm_generative_ai", ignore=(GenerationQueueFull,))
+
+def job_cache_key(role: str, skills: str, hours: str) -> str:
+    """Cache key for a job description generation."""
+    return make_cache_key(
+        {"role": role, "skills": skills, "hours": hours},
+        template_fingerprint("job_description"), GRANITE_MODEL_ID, GENERATION_PARAMS
+    )
+
+async def generate_job_description(role: str, skills: str, hours: str,
+                                   registry: Optional[ModelRegistry] = None,
+                                   use_cache: bool = True) -> str:
     """
     Generate a job description using IBM's Granite-13b-instruct model.
     
@@ -24,6 +162,8 @@ async def generate_job_description(role: str, skills: str, hours: str) -> str:
         role (str): The job role/title
         skills (str): Required skills for the position
         hours (str): Working hours
+        registry (ModelRegistry): Shared model registry (defaults to the process-wide one)
+        use_cache (bool): Reuse a cached generation; False forces a fresh variation
         
     Returns:
         str: Generated job description
@@ -32,61 +172,277 @@ async def generate_job_description(role: str, skills: str, hours: str) -> str:
         Exception: If there's an error with the IBM API call
     """
     try:
-        # Initialize the model with Granite-13b-instruct
-        credentials = get_ibm_credentials()
-        model = GenerativeModel(
-            model_id="ibm/granite-13b-instruct-v1",  # Granite-13b-instruct model
-            credentials=credentials
-        )
-        
         # Construct the prompt
-        prompt = f"""Write a detailed job description for a {role} position at a local store.
-Required skills: {skills}
-Working hours: {hours}
-
-Please include:
-1. A compelling job overview
-2. Detailed responsibilities
-3. Required qualifications and skills
-4. Working conditions and benefits
-5. How to apply
-
-Format the response in clear sections with bullet points where appropriate."""
-
-        # Generate response with appropriate parameters for job description
-        response = model.generate(
-            prompt=prompt,
-            max_new_tokens=1000,  # Longer response for detailed job description
-            temperature=0.7,      # Balanced between creativity and consistency
-            top_p=0.9,           # Allow some diversity in responses
-            repetition_penalty=1.1 # Slightly penalize repetition
-        )
-        
-        return response.generated_text
+        with metrics.stage("prompt", "ibm_utils"):
+            prompt = build_job_prompt(role, skills, hours)
+
+        cache = get_response_cache()
+        cache_key = job_cache_key(role, skills, hours)
+        semantic_cache = _semantic_cache if use_cache else None
+        if use_cache:
+            cached = await cache.aget(cache_key)
+            if cached is not None:
+                return cached
+            if semantic_cache is not None:
+                cached = await semantic_cache.lookup(semantic_input_text(role, skills, hours))
+                if cached is not None:
+                    return cached
+
+        # Reuse the shared Granite-13b-instruct model
+        model = (registry or get_model_registry()).get_model(GRANITE_MODEL_ID)
+
+        async def generate() -> str:
+            # Generate response with appropriate parameters for job description
+            with metrics.stage("model_call", "ibm_utils"):
+                response = await _resilience.call(
+                    lambda slot: slot.run(model.generate, prompt=prompt, **GENERATION_PARAMS),
+                    admit=get_generation_pool().admit
+                )
+            metrics.tokens.inc(count_tokens(response, response.generated_text), "ibm_utils")
+            await cache.aset(cache_key, response.generated_text)
+            if semantic_cache is not None:
+                await semantic_cache.add(semantic_input_text(role, skills, hours), response.generated_text)
+            return response.generated_text
+
+        if not use_cache:
+            # A fresh variation should not be shared with other callers
+            return await generate()
+        return await _job_flights.do(cache_key, generate)
         
+    except GenerationQueueFull:
+        raise
+    except CircuitOpen:
+        raise Exception("The job description generator is temporarily unavailable. Please try again shortly.")
+    except asyncio.TimeoutError:
+        raise Exception("Error generating job description: the model took too long to respond")
     except Exception as e:
         raise Exception(f"Error generating job description: {str(e)}")
 
+async def stream_job_description(role: str, skills: str, hours: str,
+                                 registry: Optional[ModelRegistry] = None,
+                                 use_cache: bool = True) -> AsyncIterator[str]:
+    """
+    Stream a job description from Granite as text chunks.
+
+    Uses the SDK's streaming call when available; otherwise the full
+    generation is yielded as a single chunk. Cached generations are yielded
+    as a single chunk without calling the model.
+
+    Raises:
+        GenerationQueueFull: If no generation slot is available
+        Exception: If there's an error with the IBM API call
+    """
+    prompt = build_job_prompt(role, skills, hours)
+    cache = get_response_cache()
+    cache_key = job_cache_key(role, skills, hours)
+    if use_cache:
+        cached = await cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    model = (registry or get_model_registry()).get_model(GRANITE_MODEL_ID)
+    pool = get_generation_pool()
+
+    try:
+        generate_stream = getattr(model, "generate_stream", None)
+        if generate_stream is None:
+            with metrics.stage("model_call", "ibm_utils"):
+                response = await _resilience.call(
+                    lambda slot: slot.run(model.generate, prompt=prompt, **GENERATION_PARAMS),
+                    admit=pool.admit
+                )
+            metrics.tokens.inc(count_tokens(response, response.generated_text), "ibm_utils")
+            await cache.aset(cache_key, response.generated_text)
+            yield response.generated_text
+            return
+
+        # Streams can't be hedged or bounded by a single deadline, but they
+        # still fail fast while the circuit is open
+        _resilience.breaker.before_call()
+        settled = False
+        try:
+            parts = []
+            started = time.perf_counter()
+            async for chunk in pool.stream(generate_stream, prompt=prompt, **GENERATION_PARAMS):
+                text = getattr(chunk, "generated_text", chunk)
+                if text:
+                    if not parts:
+                        metrics.stage_seconds.observe(time.perf_counter() - started, "ibm_utils", "first_token")
+                    parts.append(text)
+                    yield text
+            metrics.stage_seconds.observe(time.perf_counter() - started, "ibm_utils", "model_stream")
+            metrics.tokens.inc(len(parts), "ibm_utils")
+            _resilience.breaker.record_success()
+            settled = True
+            await cache.aset(cache_key, "".join(parts))
+        except GenerationQueueFull:
+            raise
+        except Exception:
+            _resilience.breaker.record_failure()
+            settled = True
+            raise
+        finally:
+            # Queue rejections, client disconnects and cancellation say
+            # nothing about the backend; don't leave a half-open trial pending
+            if not settled:
+                _resilience.breaker.release_trial()
+    except GenerationQueueFull:
+        raise
+    except CircuitOpen:
+        raise Exception("The job description generator is temporarily unavailable. Please try again shortly.")
+    except Exception as e:
+        raise Exception(f"Error generating job description: {str(e)}")
+
+_BULLET = re.compile(r'^(?:[•\-–]|\*(?!\*))\s*')
+_NUMBERED = re.compile(r'^\d{1,3}[.)]\s+')
+_MARKDOWN_HEADING = re.compile(r'^#{1,6}\s+')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+
+# Formatted output keyed by a hash of the source text
+FORMAT_CACHE_SIZE = int(os.getenv("FORMAT_CACHE_SIZE", "512"))
+_format_cache: "OrderedDict[bytes, str]" = OrderedDict()
+
+def _inline(text: str) -> str:
+    """Escape model output and render **bold** spans."""
+    return _BOLD.sub(r'<strong>\1</strong>', html.escape(text, quote=False))
+
+def _heading_text(line: str) -> Optional[str]:
+    """Return the heading text if the line is a heading, else None."""
+    if _MARKDOWN_HEADING.match(line):
+        return _MARKDOWN_HEADING.sub('', line)
+    if line.startswith('**') and line.endswith('**') and line.count('**') == 2 and len(line) > 4:
+        return line[2:-2]
+    if line.endswith(':') and len(line) <= 60 and not _BOLD.search(line):
+        return line
+    return None
+
+class _SectionRenderer:
+    """
+    Line-at-a-time renderer shared by the batch and streaming formatters.
+
+    Lines are classified once as they arrive; a blank line (or the end of
+    the text) closes the current section and returns its HTML.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._list_tag: Optional[str] = None
+        self._paragraph: List[str] = []
+
+    def add_line(self, line: str) -> Optional[str]:
+        """Add one line; returns a finished section's HTML on a blank line."""
+        line = line.strip()
+        if not line:
+            return self.close()
+
+        bullet = _BULLET.match(line)
+        numbered = None if bullet else _NUMBERED.match(line)
+        if bullet or numbered:
+            self._end_paragraph()
+            tag = 'ul' if bullet else 'ol'
+            if self._list_tag != tag:
+                self._end_list()
+                css = 'list-disc' if tag == 'ul' else 'list-decimal'
+                self._parts.append(f'<{tag} class="{css} pl-6 mb-4">')
+                self._list_tag = tag
+            item = line[(bullet or numbered).end():]
+            self._parts.append(f'<li>{_inline(item)}</li>')
+            return None
+
+        self._end_list()
+        heading = _heading_text(line)
+        if heading is not None:
+            self._end_paragraph()
+            self._parts.append(f'<h3 class="text-lg font-semibold mb-2">{_inline(heading)}</h3>')
+        else:
+            self._paragraph.append(_inline(line))
+        return None
+
+    def close(self) -> Optional[str]:
+        """Finish the current section, if any, and return its HTML."""
+        self._end_list()
+        self._end_paragraph()
+        if not self._parts:
+            return None
+        section, self._parts = '\n'.join(self._parts), []
+        return section
+
+    def _end_list(self):
+        if self._list_tag is not None:
+            self._parts.append(f'</{self._list_tag}>')
+            self._list_tag = None
+
+    def _end_paragraph(self):
+        if self._paragraph:
+            self._parts.append(f'<p class="mb-4">{"<br>".join(self._paragraph)}</p>')
+            self._paragraph = []
+
 def format_job_description(text: str) -> str:
     """
     Format the generated job description for HTML display.
-    Converts newlines to <br> tags and ensures proper spacing.
+
+    Handles bullet and numbered lists, headings and **bold**, escapes the
+    model output, and converts single newlines inside paragraphs to <br>.
+    Results are cached by content hash.
     """
-    # Split into sections and format
-    sections = text.split('\n\n')
-    formatted_sections = []
-    
-    for section in sections:
-        if section.strip():
-            # Convert bullet points to HTML list items
-            if section.strip().startswith('•') or section.strip().startswith('-'):
-                items = [item.strip('•- ').strip() for item in section.split('\n') if item.strip()]
-                formatted_section = '<ul class="list-disc pl-6 mb-4">\n'
-                formatted_section += '\n'.join(f'<li>{item}</li>' for item in items)
-                formatted_section += '\n</ul>'
-            else:
-                # Regular paragraph
-                formatted_section = f'<p class="mb-4">{section.strip()}</p>'
-            formatted_sections.append(formatted_section)
-    
-    return '\n'.join(formatted_sections) 
\ No newline at end of file
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    cached = _format_cache.get(key)
+    if cached is not None:
+        _format_cache.move_to_end(key)
+        metrics.event("format_cache_hit", "ibm_utils")
+        return cached
+
+    with metrics.stage("format", "ibm_utils"):
+        renderer = _SectionRenderer()
+        sections = []
+        for line in text.splitlines():
+            section = renderer.add_line(line)
+            if section is not None:
+                sections.append(section)
+        section = renderer.close()
+        if section is not None:
+            sections.append(section)
+        formatted = '\n'.join(sections)
+
+    _format_cache[key] = formatted
+    if len(_format_cache) > FORMAT_CACHE_SIZE:
+        _format_cache.popitem(last=False)
+    return formatted
+
+class IncrementalFormatter:
+    """
+    Streaming counterpart of format_job_description.
+
+    Feed text chunks as they arrive; each call returns the HTML for sections
+    whose closing blank line has been seen. Only the unfinished last line is
+    buffered, so earlier text is never re-scanned.
+    """
+
+    def __init__(self):
+        self._renderer = _SectionRenderer()
+        self._partial = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add a chunk and return HTML for any sections it completed."""
+        lines = (self._partial + chunk).split('\n')
+        self._partial = lines.pop()
+        blocks = []
+        for line in lines:
+            section = self._renderer.add_line(line)
+            if section is not None:
+                blocks.append(section)
+        return blocks
+
+    def close(self) -> List[str]:
+        """Flush the trailing section once the stream has ended."""
+        blocks = []
+        if self._partial:
+            section = self._renderer.add_line(self._partial)
+            if section is not None:
+                blocks.append(section)
+            self._partial = ""
+        section = self._renderer.close()
+        if section is not None:
+            blocks.append(section)
+        return blocks
@@ -0,0 +1,83 @@
+import threading
+from typing import Dict, Hashable, List, Tuple
+
+import numpy as np
+
+
+class JobIndex:
+    """
+    In-memory matrix of normalized job embeddings for top-K ranking.
+
+    Rows are stored contiguously in a float32 matrix that grows by doubling.
+    Removing a job moves the last row into its slot, so add and remove are
+    O(dim) and a search is one matrix-vector product plus argpartition.
+    """
+
+    def __init__(self, dimension: int, initial_capacity: int = 1024):
+        self.dimension = dimension
+        self._matrix = np.zeros((initial_capacity, dimension), dtype=np.float32)
+        self._ids: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, job_id: Hashable) -> bool:
+        return job_id in self._rows
+
+    def add(self, job_id: Hashable, vector: np.ndarray):
+        """Insert or replace the embedding for job_id."""
+        self.add_many([job_id], vector.reshape(1, -1))
+
+    def add_many(self, job_ids: List[Hashable], vectors: np.ndarray):
+        """Insert or replace embeddings for several jobs at once."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._reserve(len(self._ids) + len(job_ids))
+            for job_id, vector in zip(job_ids, vectors):
+                row = self._rows.get(job_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(job_id)
+                    self._rows[job_id] = row
+                self._matrix[row] = vector
+
+    def remove(self, job_id: Hashable) -> bool:
+        """Drop job_id from the index; returns False if it was not present."""
+        with self._lock:
+            row = self._rows.pop(job_id, None)
+            if row is None:
+                return False
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+            return True
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[Hashable, float]]:
+        """Return the k (job_id, similarity) pairs closest to a normalized query."""
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or k <= 0:
+                return []
+            scores = self._matrix[:n] @ np.asarray(query, dtype=np.float32)
+            if k < n:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[i], float(scores[i])) for i in top]
+
+    def _reserve(self, size: int):
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+        grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = grown
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from generation_pool import GenerationQueueFull
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobQueue:
+    """
+    Durable background queue for long generations, backed by SQLite.
+
+    Jobs are deduplicated on (kind, payload): submitting the same input
+    returns the existing job unless it failed, or it finished more than
+    ``result_ttl`` seconds ago, or the caller asked for a fresh run. Jobs
+    rejected by a full generation pool are requeued after its Retry-After
+    hint without using up an attempt; other failures are retried with
+    exponential backoff until ``max_attempts`` is reached. Jobs left
+    'running' by a process that no longer exists are requeued on start, so
+    work resumes after a restart. Database work after start runs in the
+    default executor, off the event loop.
+    """
+
+    def __init__(self, db_path: str = None, handlers: Dict[str, Handler] = None,
+                 workers: int = None, max_attempts: int = None, poll_interval: float = 0.5,
+                 result_ttl: float = None, retry_backoff: float = None):
+        self.db_path = db_path or os.getenv("JOB_QUEUE_PATH", "job_queue.db")
+        self.handlers = handlers or {}
+        self.workers = workers or int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl or float(os.getenv("JOB_QUEUE_RESULT_TTL", "86400"))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(os.getenv("JOB_QUEUE_RETRY_BACKOFF", "10"))
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " dedupe_key TEXT NOT NULL UNIQUE,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        if "not_before" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        """Requeue jobs whose worker process died and start the worker tasks."""
+        with self._lock:
+            running = self._db.execute(
+                "SELECT id, owner FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            # Other live worker processes may share this file; leave their jobs alone
+            orphaned = [job_id for job_id, owner in running if not _process_alive(owner)]
+            for job_id in orphaned:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, updated_at = ? WHERE id = ?",
+                    (time.time(), job_id)
+                )
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; running jobs are picked up again on next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # A cancelled worker's last update may still be running in the executor
+        with self._lock:
+            self._db.close()
+
+    async def submit(self, kind: str, payload: Dict[str, Any], reuse_done: bool = True) -> str:
+        """
+        Queue a job, or return the id of an identical queued/running/done job.
+
+        With reuse_done=False a finished identical job is not reused, so the
+        work runs again under a new id.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        body = json.dumps(payload, sort_keys=True)
+        job_id, queued = await self._run(self._insert, kind, body, reuse_done)
+        if queued:
+            self._notify()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status and (when done) result of a job."""
+        return await self._run(self._fetch, job_id)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    def _insert(self, kind: str, body: str, reuse_done: bool) -> Tuple[str, bool]:
+        """Return (job id, whether it was (re)queued)."""
+        dedupe_key = hashlib.sha256(f"{kind}\n{body}".encode("utf-8")).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, updated_at FROM jobs WHERE dedupe_key = ?", (dedupe_key,)
+            ).fetchone()
+            if row is not None:
+                job_id, status, updated_at = row
+                if status == "failed":
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'queued', error = NULL, attempts = 0, not_before = NULL,"
+                        " updated_at = ? WHERE id = ?", (now, job_id)
+                    )
+                    return job_id, True
+                if status != "done" or (reuse_done and now - updated_at < self.result_ttl):
+                    return job_id, False
+                # Retire the finished job from deduplication; its result stays readable by id
+                self._db.execute(
+                    "UPDATE jobs SET dedupe_key = ? WHERE id = ?", (f"{dedupe_key}:{job_id}", job_id)
+                )
+
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, dedupe_key, payload, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, dedupe_key, body, now, now)
+            )
+        return job_id, True
+
+    def _fetch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, result, error, attempts, created_at, updated_at"
+                " FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "result": json.loads(row[3]) if row[3] is not None else None,
+            "error": row[4],
+            "attempts": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _claim(self) -> Optional[tuple]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, kind, payload, attempts FROM jobs"
+                    " WHERE status = 'queued' AND (not_before IS NULL OR not_before <= ?)"
+                    " ORDER BY created_at LIMIT 1", (time.time(),)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, updated_at = ?"
+                        " WHERE id = ?", (os.getpid(), time.time(), row[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return row
+
+    def _defer(self, job_id: str, delay: float, error: str, refund_attempt: bool = False):
+        """Requeue a job to run no sooner than delay seconds from now."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - ?, owner = NULL,"
+                " not_before = ?, error = ?, updated_at = ? WHERE id = ?",
+                (1 if refund_attempt else 0, now + delay, error, now, job_id)
+            )
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: str = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    async def _worker(self):
+        while True:
+            row = await self._run(self._claim)
+            if row is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, kind, payload, attempts = row
+            try:
+                result = await self.handlers[kind](json.loads(payload))
+                await self._run(self._finish, job_id, "done", result)
+            except asyncio.CancelledError:
+                # Leave it 'running'; start() requeues it
+                raise
+            except GenerationQueueFull as e:
+                # Local back-pressure, not a failed attempt: try again later
+                await self._run(self._defer, job_id, e.retry_after, str(e), True)
+            except Exception as e:
+                logger.error(f"Background job {job_id} failed: {str(e)}")
+                if attempts + 1 < self.max_attempts:
+                    # Back off so a backend outage (e.g. an open circuit) can clear
+                    delay = self.retry_backoff * (2 ** attempts) * (0.5 + random.random())
+                    await self._run(self._defer, job_id, delay, str(e))
+                else:
+                    await self._run(self._finish, job_id, "failed", None, str(e))
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        # Our own pid means a previous run of this process image, e.g. a reload
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
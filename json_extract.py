@@ -0,0 +1,90 @@
+import json
+import re
+from typing import Any, Dict, Optional
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class JsonObjectScanner:
+    """
+    Incrementally find the first complete top-level JSON object in a stream.
+
+    Feed text chunks as they arrive; feed() returns the object's source text
+    as soon as its closing brace is seen, so generation can stop there. Text
+    before the opening brace (prose, code fences) is skipped. Each character
+    is examined once.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.result: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Source seen from the opening brace on: the object, or as much of it as arrived."""
+        return self.result if self.result is not None else "".join(self._buffer)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.result is not None:
+            return self.result
+        start = 0
+        for i, char in enumerate(chunk):
+            if not self._started:
+                if char != "{":
+                    continue
+                self._started = True
+                start = i
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(chunk[start:i + 1])
+                    self.result = "".join(self._buffer)
+                    return self.result
+        if self._started:
+            self._buffer.append(chunk[start:])
+        return None
+
+
+def loads_tolerant(text: str) -> Optional[Any]:
+    """json.loads with light repairs for common model mistakes."""
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Recover the first JSON object embedded in free text.
+
+    Tries each opening brace in turn so a stray '{' in leading prose does not
+    hide a valid object after it.
+    """
+    start = text.find("{")
+    while start != -1:
+        scanner = JsonObjectScanner()
+        source = scanner.feed(text[start:])
+        if source is not None:
+            value = loads_tolerant(source)
+            if isinstance(value, dict):
+                return value
+        start = text.find("{", start + 1)
+    return None
@@ -1,17 +1,109 @@
-from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi import FastAPI, Request, Form, HTTPException, Body, UploadFile, File
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
+import json
+import logging
 import os
 from dotenv import load_dotenv
-from ibm_utils import generate_job_description, format_job_description
+from ibm_utils import (
+    generate_job_description,
+    format_job_description,
+    stream_job_description,
+    IncrementalFormatter,
+    get_model_registry,
+    close_model_registry,
+    set_semantic_cache,
+)
+from generation_pool import GenerationQueueFull, get_generation_pool, shutdown_generation_pool
+from response_cache import get_response_cache
+from metrics import metrics
+from resilience import resilience_status
+from bulk_generation import BulkScheduler, parse_bulk_upload
+from job_queue import JobQueue
+import ibm_utils
+
+logger = logging.getLogger(__name__)
+
+# The Granite service needs the WML SDK, sentence-transformers and app
+# settings; the form routes keep working without them.
+try:
+    from granite_services import granite_service
+except ImportError as e:
+    logger.warning(f"Granite service unavailable, matching/ranking/store routes will return 503: {str(e)}")
+    granite_service = None
 
 # Load environment variables
 load_dotenv()
 
+async def _job_description_task(payload: dict) -> dict:
+    """Background handler for /generate-job-description work."""
+    description = await generate_job_description(
+        payload["role"], payload["skills"], payload["hours"],
+        use_cache=not payload.get("fresh", False)
+    )
+    return {
+        "job_description": description,
+        "formatted_description": format_job_description(description)
+    }
+
+async def _store_job_description_task(payload: dict) -> dict:
+    """Background handler for GraniteService.generate_store_job_description."""
+    if granite_service is None:
+        raise RuntimeError("Granite service is not available")
+    # Fallback text must not be stored as a finished result; raising lets the
+    # queue retry with backoff (or defer, for a full pool) instead
+    return await granite_service.generate_store_job_description(payload, allow_fallback=False)
+
+def _install_semantic_cache():
+    """Put the near-duplicate cache in front of generate_job_description."""
+    if not granite_service.embeddings_ready:
+        logger.warning("Semantic cache disabled: embedding model is not available")
+        return
+    from semantic_cache import SemanticCache
+    set_semantic_cache(SemanticCache(
+        "job_description", granite_service.embed_text, granite_service.embeddings.dimension
+    ))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared clients on startup and release them on shutdown."""
+    registry = get_model_registry()
+    try:
+        registry.start()
+    except Exception as e:
+        # Credentials may be missing in dev; routes will surface the error
+        logger.warning(f"Model registry not started: {str(e)}")
+    app.state.model_registry = registry
+    if granite_service is not None:
+        # Warm up in the background so the form routes serve immediately
+        warmup = granite_service.start()
+        # One switch (settings.SEMANTIC_CACHE_ENABLED) for both semantic caches
+        if granite_service.semantic_cache_enabled:
+            warmup.add_done_callback(lambda _: _install_semantic_cache())
+    app.state.job_queue = JobQueue(handlers={
+        "job_description": _job_description_task,
+        "store_job_description": _store_job_description_task,
+    })
+    app.state.job_queue.start()
+    yield
+    await app.state.job_queue.stop()
+    if granite_service is not None:
+        await granite_service.cleanup()
+    set_semantic_cache(None)
+    close_model_registry()
+    shutdown_generation_pool()
+    get_response_cache().close()
+
+# Under a pre-forking server (see gunicorn_conf.py) load the embedding model
+# once in the master so workers share it
+if os.getenv("PRELOAD_MODELS") == "1" and granite_service is not None:
+    granite_service.preload_embeddings()
+
 # Initialize FastAPI app
-app = FastAPI(title="Smart Job Description Generator")
+app = FastAPI(title="Smart Job Description Generator", lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -19,6 +111,45 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="templates")
 
+# Gauges are read lazily when /metrics is scraped
+metrics.gauge("hackit_generations_in_flight", "Granite calls currently running", lambda: get_generation_pool().in_flight)
+metrics.gauge("hackit_generations_waiting", "Granite calls waiting for a slot", lambda: get_generation_pool().waiting)
+metrics.gauge("hackit_generations_coalesced_in_flight", "Distinct single-flight generations running", lambda: ibm_utils._job_flights.in_flight())
+metrics.gauge("hackit_response_cache_hits", "Response cache memory hits", lambda: get_response_cache().hits)
+metrics.gauge("hackit_response_cache_disk_hits", "Response cache disk hits", lambda: get_response_cache().disk_hits)
+metrics.gauge("hackit_response_cache_misses", "Response cache misses", lambda: get_response_cache().misses)
+if granite_service is not None:
+    metrics.gauge("hackit_embedding_cache_hits", "Embedding cache hits", lambda: granite_service.embeddings.hits)
+    metrics.gauge("hackit_embedding_cache_misses", "Embedding cache misses", lambda: granite_service.embeddings.misses)
+
+async def profile_request(request: Request, call_next):
+    """
+    Profile a single request with ?profile=1.
+
+    Uses the pyinstrument sampling profiler if it is installed and returns
+    its HTML report instead of the normal response.
+    """
+    if request.query_params.get("profile") != "1":
+        return await call_next(request)
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("Profiling requested but pyinstrument is not installed")
+        return await call_next(request)
+
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    response = await call_next(request)
+    # Drain streaming bodies so the profile covers the whole request
+    async for _ in response.body_iterator:
+        pass
+    profiler.stop()
+    return HTMLResponse(profiler.output_html())
+
+# Only installed when asked for at startup; the wrapper costs every request
+if os.getenv("PROFILING_ENABLED"):
+    app.middleware("http")(profile_request)
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render the home page."""
@@ -45,27 +176,48 @@ async def generate_job_description_post(
     request: Request,
     role: str = Form(...),
     skills: str = Form(...),
-    hours: str = Form(...)
+    hours: str = Form(...),
+    fresh: bool = Form(False)
 ):
     """Process the job description generation form."""
     try:
         # Generate job description using IBM Granite model
-        description = await generate_job_description(role, skills, hours)
+        description = await generate_job_description(
+            role, skills, hours,
+            registry=request.app.state.model_registry,
+            use_cache=not fresh
+        )
         
         # Format the description for HTML display
         formatted_description = format_job_description(description)
         
+        with metrics.stage("render", "main"):
+            return templates.TemplateResponse(
+                "generate_job.html",
+                {
+                    "request": request,
+                    "title": "Generated Job Description",
+                    "role": role,
+                    "skills": skills,
+                    "hours": hours,
+                    "job_description": formatted_description,
+                    "error": None
+                }
+            )
+    except GenerationQueueFull as e:
         return templates.TemplateResponse(
             "generate_job.html",
             {
                 "request": request,
-                "title": "Generated Job Description",
+                "title": "Generate Job Description",
                 "role": role,
                 "skills": skills,
                 "hours": hours,
-                "job_description": formatted_description,
-                "error": None
-            }
+                "error": "The generator is busy right now. Please try again shortly.",
+                "job_description": None
+            },
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
         )
     except Exception as e:
         return templates.TemplateResponse(
@@ -81,6 +233,210 @@ async def generate_job_description_post(
             }
         )
 
+def _sse_event(event: str, data: dict) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/generate-job-description/stream")
+async def generate_job_description_stream(
+    request: Request,
+    role: str,
+    skills: str,
+    hours: str,
+    fresh: bool = False
+):
+    """
+    Stream a job description as server-sent events.
+
+    Emits ``token`` events with raw text as it arrives, ``html`` events with
+    each finished section, then ``done`` (or ``error``).
+    """
+    registry = request.app.state.model_registry
+
+    async def events():
+        formatter = IncrementalFormatter()
+        try:
+            async for chunk in stream_job_description(
+                role, skills, hours, registry=registry, use_cache=not fresh
+            ):
+                yield _sse_event("token", {"text": chunk})
+                for block in formatter.feed(chunk):
+                    yield _sse_event("html", {"html": block})
+            for block in formatter.close():
+                yield _sse_event("html", {"html": block})
+            yield _sse_event("done", {})
+        except GenerationQueueFull as e:
+            yield _sse_event("error", {
+                "error": "The generator is busy right now. Please try again shortly.",
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            yield _sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _require_granite_service():
+    if granite_service is None or not granite_service.embeddings_ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Job matching service is not available",
+            headers={"Retry-After": "10"}
+        )
+    return granite_service
+
+@app.get("/ready")
+async def ready():
+    """Report whether the Granite service has finished warming up."""
+    if granite_service is None:
+        return JSONResponse({"ready": False, "error": "Granite service not installed"}, status_code=503)
+    status = granite_service.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.post("/api/jobs/index")
+async def index_jobs(jobs: list = Body(...)):
+    """Add or update job postings in the ranking index."""
+    service = _require_granite_service()
+    indexed = await service.index_jobs(jobs)
+    return {"indexed": indexed, "total": len(service.job_index)}
+
+@app.post("/api/jobs/catalog")
+async def load_job_catalog(jobs: list = Body(...)):
+    """Sync the full job catalog into the persistent embedding store."""
+    service = _require_granite_service()
+    encoded = await service.warm_start_jobs(jobs)
+    return {"encoded": encoded, "total": len(jobs)}
+
+@app.delete("/api/jobs/{job_id}")
+async def remove_job(job_id: str):
+    """Remove a job posting from the ranking index."""
+    service = _require_granite_service()
+    if not service.remove_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"removed": job_id, "total": len(service.job_index)}
+
+@app.post("/api/candidates")
+async def update_candidates(profiles: list = Body(...)):
+    """Add or update candidate profiles used for feature-based matching."""
+    service = _require_granite_service()
+    encoded = await service.update_candidates(profiles)
+    return {"encoded_fields": encoded, "total": len(service.match_features.candidates)}
+
+@app.post("/api/match-scores")
+async def match_scores(user_ids: list = Body(...), job_ids: list = Body(None)):
+    """Score candidates against jobs from precomputed features (no LLM call)."""
+    service = _require_granite_service()
+    return {"scores": await service.score_matches(user_ids, job_ids)}
+
+@app.post("/api/jobs/rank")
+async def rank_jobs(
+    user_profile: dict = Body(...),
+    k: int = Body(10),
+    analyze: int = Body(0)
+):
+    """Return the k indexed jobs that best fit a candidate profile."""
+    service = _require_granite_service()
+    return {"results": await service.rank_jobs(user_profile, k=k, analyze=analyze)}
+
+@app.post("/api/jobs/bulk")
+async def bulk_generate(file: UploadFile = File(...)):
+    """
+    Generate descriptions for a JSONL or CSV upload of job inputs.
+
+    Results stream back as NDJSON, one line per row as each finishes.
+    """
+    try:
+        rows = parse_bulk_upload(await file.read(), file.filename or "")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    scheduler = BulkScheduler(granite_service=granite_service)
+
+    async def results():
+        async for result in scheduler.run(rows):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/api/tasks/job-description", status_code=202)
+async def submit_job_description_task(
+    request: Request,
+    role: str = Body(...),
+    skills: str = Body(...),
+    hours: str = Body(...),
+    fresh: bool = Body(False)
+):
+    """Queue a job description generation and return its task id."""
+    job_id = await request.app.state.job_queue.submit(
+        "job_description", {"role": role, "skills": skills, "hours": hours, "fresh": fresh},
+        reuse_done=not fresh
+    )
+    return {"task_id": job_id, "status_url": f"/api/tasks/{job_id}"}
+
+@app.post("/api/tasks/store-job-description", status_code=202)
+async def submit_store_job_description_task(request: Request, store_job_input: dict = Body(...)):
+    """Queue a store job posting generation and return its task id."""
+    job_id = await request.app.state.job_queue.submit("store_job_description", store_job_input)
+    return {"task_id": job_id, "status_url": f"/api/tasks/{job_id}"}
+
+@app.get("/api/tasks/{task_id}")
+async def get_task(request: Request, task_id: str):
+    """Status and, once finished, the result of a background generation."""
+    task = await request.app.state.job_queue.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Expose latency histograms, counters and gauges in Prometheus format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/backend-status")
+async def backend_status():
+    """Circuit breaker state and observed latency per Granite backend."""
+    return resilience_status()
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """Report response cache hit/miss counters."""
+    stats = get_response_cache().stats()
+    semantic = [ibm_utils._semantic_cache]
+    if granite_service is not None:
+        semantic.append(granite_service.semantic_cache)
+    stats["semantic"] = {cache.name: cache.stats() for cache in semantic if cache is not None}
+    return stats
+
+def configure_shared_state(state_dir: str):
+    """
+    Point the response cache and rate limiter at files shared by all workers.
+
+    Explicit RESPONSE_CACHE_PATH / GRANITE_RATE_LIMIT_DB settings win.
+    Workers inherit the environment, so this must run before they start.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    os.environ.setdefault("RESPONSE_CACHE_PATH", os.path.join(state_dir, "response_cache.db"))
+    os.environ.setdefault("GRANITE_RATE_LIMIT_DB", os.path.join(state_dir, "rate_limit.db"))
+    os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(state_dir, "job_queue.db"))
+
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Run the Smart Job Description Generator")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--production", action="store_true", help="disable auto-reload")
+    parser.add_argument("--state-dir", default=os.getenv("STATE_DIR", ".state"),
+                        help="directory for the cross-worker cache and rate limit files")
+    args = parser.parse_args()
+
+    if args.workers > 1 or args.production:
+        configure_shared_state(args.state_dir)
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True) 
\ No newline at end of file
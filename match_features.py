@@ -0,0 +1,308 @@
+import hashlib
+import re
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Width of the hashed skill-token bit vectors used for bulk Jaccard
+SKILL_BITS = 512
+
+# Score = weighted field similarities + skill-set Jaccard + experience fit
+DEFAULT_WEIGHTS = {
+    "skills": 0.35,
+    "requirements": 0.25,
+    "location": 0.10,
+    "skill_overlap": 0.20,
+    "experience": 0.10,
+}
+
+FIELDS = ("skills", "requirements", "location")
+
+_SKILL_SPLIT = re.compile(r"[,;/|\n•]+|\band\b|\s-\s")
+_YEARS = re.compile(r"(\d+(?:\.\d+)?)")
+_LEVEL_YEARS = {
+    "intern": 0.0, "entry": 0.0, "junior": 1.0, "associate": 2.0,
+    "mid": 3.0, "intermediate": 3.0, "senior": 5.0, "lead": 7.0,
+    "principal": 8.0, "manager": 5.0,
+}
+
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def skill_tokens(text: Any) -> FrozenSet[str]:
+    """Normalized skill phrases from a comma/semicolon/'and' separated list."""
+    if not text:
+        return frozenset()
+    if isinstance(text, (list, tuple, set)):
+        text = ",".join(str(item) for item in text)
+    return frozenset(
+        " ".join(part.lower().split())
+        for part in _SKILL_SPLIT.split(str(text))
+        if part.strip()
+    )
+
+
+def parse_experience_years(value: Any) -> float:
+    """Years from '3', '5+ years', '2-4 years' (lower bound) or a level name."""
+    if value is None or value == "":
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).lower()
+    match = _YEARS.search(text)
+    if match:
+        return float(match.group(1))
+    for level, years in _LEVEL_YEARS.items():
+        if level in text:
+            return years
+    return 0.0
+
+
+def _join(*parts: Any) -> str:
+    return " | ".join(str(part) for part in parts if part)
+
+
+def candidate_fields(profile: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "skills": _join(profile.get("skills")),
+        "requirements": _join(profile.get("bio"), profile.get("education")),
+        "location": _join(profile.get("location")),
+    }
+
+
+def job_fields(job: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "skills": _join(job.get("skills_required")),
+        "requirements": _join(job.get("title"), job.get("requirements"), job.get("description")),
+        "location": _join(job.get("location")),
+    }
+
+
+def _skill_bit_vector(tokens: FrozenSet[str]) -> Tuple[np.ndarray, int]:
+    """Packed hashed bit vector for a skill set, and its number of set bits."""
+    bits = np.zeros(SKILL_BITS, dtype=bool)
+    for token in tokens:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest()
+        bits[int.from_bytes(digest, "little") % SKILL_BITS] = True
+    return np.packbits(bits), int(np.count_nonzero(bits))
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+class MatchProfile:
+    """Per-entity bookkeeping; the vectors themselves live in the side's arrays."""
+
+    __slots__ = ("id", "row", "field_hashes", "experience_years", "skills")
+
+    def __init__(self, entity_id: Hashable, row: int):
+        self.id = entity_id
+        self.row = row
+        self.field_hashes: Dict[str, bytes] = {}
+        self.experience_years = 0.0
+        self.skills: FrozenSet[str] = frozenset()
+
+
+class FeatureSide:
+    """
+    Array-backed features for one side of the match (candidates or jobs).
+
+    Each field has its own (capacity, dim) float32 matrix of normalized
+    embeddings; experience years and bit-packed hashed skill sets sit in
+    parallel arrays. Upserts re-encode only fields whose text changed, outside
+    the lock; removal moves the last row into the freed slot.
+    """
+
+    def __init__(self, dimension: int, extract: Callable[[Dict[str, Any]], Dict[str, str]],
+                 years: Callable[[Dict[str, Any]], Any], skills: Callable[[Dict[str, Any]], Any],
+                 initial_capacity: int = 256):
+        self.dimension = dimension
+        self._extract = extract
+        self._years = years
+        self._skills = skills
+        self._capacity = initial_capacity
+        self.vectors = {f: np.zeros((initial_capacity, dimension), dtype=np.float32) for f in FIELDS}
+        self.experience = np.zeros(initial_capacity, dtype=np.float32)
+        self.skill_bits = np.zeros((initial_capacity, SKILL_BITS // 8), dtype=np.uint8)
+        self.skill_counts = np.zeros(initial_capacity, dtype=np.float32)
+        self.records: Dict[Hashable, MatchProfile] = {}
+        self.ids: List[Hashable] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, ids: Iterable[Hashable]) -> np.ndarray:
+        return np.fromiter((self.records[i].row for i in ids), dtype=np.int64)
+
+    def upsert(self, items: Dict[Hashable, Dict[str, Any]], encode: Encoder) -> int:
+        """Add or update entities; returns the number of field texts encoded."""
+        prepared = [
+            (
+                entity_id,
+                {field: (text, _text_hash(text)) for field, text in self._extract(data).items()},
+                parse_experience_years(self._years(data)),
+                skill_tokens(self._skills(data)),
+            )
+            for entity_id, data in items.items()
+        ]
+
+        # Encode changed texts without holding the lock, then write the rows
+        # under it. Loop in case a concurrent upsert or removal changed the
+        # stored hashes while we were encoding.
+        fresh: Dict[Tuple[Hashable, str], Tuple[bytes, np.ndarray]] = {}
+        encoded = 0
+        while True:
+            with self._lock:
+                stale = [
+                    (entity_id, field, text, text_hash)
+                    for entity_id, fields, _, _ in prepared
+                    for field, (text, text_hash) in fields.items()
+                    if text and self._needs_vector(entity_id, field, text_hash, fresh)
+                ]
+                if not stale:
+                    for entity_id, fields, years, tokens in prepared:
+                        self._write(entity_id, fields, years, tokens, fresh)
+                    return encoded
+            vectors = np.asarray(encode([text for _, _, text, _ in stale]), dtype=np.float32)
+            encoded += len(stale)
+            for (entity_id, field, _, text_hash), vector in zip(stale, vectors):
+                fresh[(entity_id, field)] = (text_hash, vector)
+
+    def _needs_vector(self, entity_id: Hashable, field: str, text_hash: bytes,
+                      fresh: Dict[Tuple[Hashable, str], Tuple[bytes, np.ndarray]]) -> bool:
+        entry = fresh.get((entity_id, field))
+        if entry is not None and entry[0] == text_hash:
+            return False
+        record = self.records.get(entity_id)
+        return record is None or record.field_hashes.get(field) != text_hash
+
+    def _write(self, entity_id: Hashable, fields: Dict[str, Tuple[str, bytes]], years: float,
+               tokens: FrozenSet[str], fresh: Dict[Tuple[Hashable, str], Tuple[bytes, np.ndarray]]):
+        record = self.records.get(entity_id)
+        created = record is None
+        if created:
+            self._reserve(len(self.ids) + 1)
+            record = MatchProfile(entity_id, len(self.ids))
+            self.records[entity_id] = record
+            self.ids.append(entity_id)
+
+        for field, (text, text_hash) in fields.items():
+            entry = fresh.get((entity_id, field))
+            if not text:
+                self.vectors[field][record.row] = 0.0
+            elif entry is not None and entry[0] == text_hash:
+                self.vectors[field][record.row] = entry[1]
+            else:
+                # Unchanged since the last upsert
+                continue
+            record.field_hashes[field] = text_hash
+
+        record.experience_years = years
+        self.experience[record.row] = years
+        if created or tokens != record.skills:
+            record.skills = tokens
+            self.skill_bits[record.row], self.skill_counts[record.row] = _skill_bit_vector(tokens)
+
+    def remove(self, entity_id: Hashable) -> bool:
+        with self._lock:
+            record = self.records.pop(entity_id, None)
+            if record is None:
+                return False
+            last = len(self.ids) - 1
+            if record.row != last:
+                moved = self.records[self.ids[last]]
+                for field in FIELDS:
+                    self.vectors[field][record.row] = self.vectors[field][last]
+                self.experience[record.row] = self.experience[last]
+                self.skill_bits[record.row] = self.skill_bits[last]
+                self.skill_counts[record.row] = self.skill_counts[last]
+                moved.row = record.row
+                self.ids[record.row] = moved.id
+            self.ids.pop()
+            return True
+
+    def _reserve(self, size: int):
+        if size <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        n = len(self.ids)
+        for field in FIELDS:
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:n] = self.vectors[field][:n]
+            self.vectors[field] = grown
+        for name in ("experience", "skill_counts"):
+            grown = np.zeros(capacity, dtype=np.float32)
+            grown[:n] = getattr(self, name)[:n]
+            setattr(self, name, grown)
+        grown = np.zeros((capacity, SKILL_BITS // 8), dtype=np.uint8)
+        grown[:n] = self.skill_bits[:n]
+        self.skill_bits = grown
+        self._capacity = capacity
+
+
+class MatchFeatureIndex:
+    """
+    Precomputed candidate and job features with vectorized bulk scoring.
+
+    score() combines per-field cosine similarities, a hashed skill-set
+    Jaccard and an experience fit for every (candidate, job) pair in the
+    given row sets using a handful of matrix products.
+    """
+
+    def __init__(self, dimension: int, weights: Optional[Dict[str, float]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.candidates = FeatureSide(
+            dimension, candidate_fields,
+            years=lambda p: p.get("experience_years"),
+            skills=lambda p: p.get("skills"),
+        )
+        self.jobs = FeatureSide(
+            dimension, job_fields,
+            years=lambda j: j.get("experience_years", j.get("experience_level")),
+            skills=lambda j: j.get("skills_required") or j.get("requirements"),
+        )
+
+    def score(self, candidate_rows: Optional[np.ndarray] = None,
+              job_rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(len(candidate_rows), len(job_rows)) matrix of scores in [0, 100]."""
+        c = self.candidates
+        j = self.jobs
+        if candidate_rows is None:
+            candidate_rows = np.arange(len(c))
+        if job_rows is None:
+            job_rows = np.arange(len(j))
+
+        w = self.weights
+        scores = np.zeros((len(candidate_rows), len(job_rows)), dtype=np.float32)
+        for field in FIELDS:
+            weight = w.get(field, 0.0)
+            if weight:
+                scores += weight * np.clip(
+                    c.vectors[field][candidate_rows] @ j.vectors[field][job_rows].T, 0.0, 1.0
+                )
+
+        if w.get("skill_overlap"):
+            # Only the rows being scored are unpacked
+            candidate_bits = np.unpackbits(c.skill_bits[candidate_rows], axis=1).astype(np.float32)
+            job_bits = np.unpackbits(j.skill_bits[job_rows], axis=1).astype(np.float32)
+            intersection = candidate_bits @ job_bits.T
+            union = c.skill_counts[candidate_rows][:, None] + j.skill_counts[job_rows][None, :] - intersection
+            scores += w["skill_overlap"] * np.divide(
+                intersection, union, out=np.zeros_like(intersection), where=union > 0
+            )
+
+        if w.get("experience"):
+            have = c.experience[candidate_rows][:, None]
+            need = j.experience[job_rows][None, :]
+            fit = np.where(need <= 0, 1.0, np.minimum(1.0, have / np.maximum(need, 1e-6)))
+            scores += w["experience"] * fit.astype(np.float32)
+
+        return scores * (100.0 / sum(w.values()))
+
+    def score_pair(self, candidate_id: Hashable, job_id: Hashable) -> float:
+        return float(self.score(self.candidates.rows([candidate_id]), self.jobs.rows([job_id]))[0, 0])
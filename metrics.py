@@ -0,0 +1,124 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache hits up to long generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self, label_names: Sequence[str]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_labels(label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() only bumps preallocated counters."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts, then +Inf, sum and count
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, label_names: Sequence[str]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_labels(tuple(label_names) + ('le',), labels + (le,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(label_names, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(label_names, labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.stage_seconds = Histogram("hackit_stage_seconds", "Time spent in each hot-path stage")
+        self.tokens = Counter("hackit_generated_tokens_total", "Tokens generated by Granite")
+        self.events = Counter("hackit_events_total", "Cache hits/misses and other counted events")
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    @contextmanager
+    def stage(self, name: str, component: str = "app"):
+        """Time a block as one stage observation."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - start, component, name)
+
+    def event(self, name: str, component: str = "app", amount: float = 1.0):
+        self.events.inc(amount, component, name)
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]):
+        """Register a gauge that is read only when /metrics is scraped."""
+        self._gauges[name] = (help, fn)
+
+    def render(self) -> str:
+        lines = self.stage_seconds.render(("component", "stage"))
+        lines += self.tokens.render(("component",))
+        lines += self.events.render(("component", "event"))
+        for name, (help, fn) in sorted(self._gauges.items()):
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+metrics = MetricsRegistry()
+
+
+def count_tokens(response, text: str) -> int:
+    """Token count from the SDK response when reported, else a word estimate."""
+    count: Optional[int] = getattr(response, "generated_token_count", None)
+    return int(count) if count is not None else len(text.split())
@@ -0,0 +1,204 @@
+import hashlib
+import re
+import string
+from typing import Any, Dict, Optional, Tuple
+
+# Rough English average for Granite's tokenizer; errs on the side of more tokens
+CHARS_PER_TOKEN = 4.0
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: the larger of a character- and a word-based guess."""
+    return int(max(len(text) / CHARS_PER_TOKEN, len(text.split()) * 1.3)) + 1
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Shorten text to roughly ``budget`` tokens.
+
+    Whitespace is collapsed first, which is often enough; otherwise the
+    text is cut at the last sentence or word boundary inside the budget.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    text = " ".join(text.split())
+    if estimate_tokens(text) <= budget:
+        return text
+
+    limit = int(budget * CHARS_PER_TOKEN)
+    # The word-based estimate can be the binding one for short words
+    while limit > 0 and estimate_tokens(text[:limit]) > budget:
+        limit = int(limit * 0.9)
+    head = text[:limit]
+    cut = max(head.rfind(". "), head.rfind("\n"))
+    if cut < limit // 2:
+        cut = head.rfind(" ")
+    if cut > 0:
+        head = head[:cut + 1]
+    return head.rstrip() + " …"
+
+
+def normalize_whitespace(text: str) -> str:
+    """Strip per-line indentation and trailing space, and collapse blank runs."""
+    lines = [line.strip() for line in text.strip().splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+
+
+class PromptTemplate:
+    """
+    A prompt compiled once at import time.
+
+    The source is whitespace-normalized and its fields parsed up front.
+    render() truncates the fields listed in ``budgets`` to their token budget
+    and returns the prompt together with this kind's max_new_tokens.
+    """
+
+    def __init__(self, kind: str, source: str, max_new_tokens: int,
+                 budgets: Optional[Dict[str, int]] = None, normalize: bool = True):
+        self.kind = kind
+        self.text = normalize_whitespace(source) if normalize else source
+        self.max_new_tokens = max_new_tokens
+        self.budgets = budgets or {}
+        self.fields = {
+            name for _, name, _, _ in string.Formatter().parse(self.text) if name
+        }
+        self.fingerprint = hashlib.sha256(
+            f"{kind}\n{self.text}\n{sorted(self.budgets.items())}".encode("utf-8")
+        ).hexdigest()
+
+    def render(self, **values: Any) -> Tuple[str, Dict[str, Any]]:
+        fields = {}
+        for name in self.fields:
+            value = str(values.get(name, ""))
+            budget = self.budgets.get(name)
+            fields[name] = truncate_to_tokens(value, budget) if budget else value
+        return self.text.format(**fields), {"max_new_tokens": self.max_new_tokens}
+
+
+_templates: Dict[str, PromptTemplate] = {}
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    _templates[template.kind] = template
+    return template
+
+def max_new_tokens_for(kind: str) -> int:
+    """Generation length budget for a prompt kind."""
+    return _templates[kind].max_new_tokens
+
+def template_fingerprint(kind: str) -> str:
+    """Identity of a prompt kind's template; changes whenever its text or budgets do."""
+    return _templates[kind].fingerprint
+
+def render_prompt(kind: str, **values: Any) -> Tuple[str, Dict[str, Any]]:
+    """Render a registered prompt kind; returns (prompt, generation param overrides)."""
+    return _templates[kind].render(**values)
+
+
+register(PromptTemplate("job_description", """
+    Write a detailed job description for a {role} position at a local store.
+    Required skills: {skills}
+    Working hours: {hours}
+
+    Please include:
+    1. A compelling job overview
+    2. Detailed responsibilities
+    3. Required qualifications and skills
+    4. Working conditions and benefits
+    5. How to apply
+
+    Format the response in clear sections with bullet points where appropriate.
+""", max_new_tokens=900, budgets={"role": 30, "skills": 300, "hours": 40}))
+
+register(PromptTemplate("store_job_description", """
+    You are a professional job posting writer. Create a clear, complete, and industry-appropriate job description for a local store/business based on the following information:
+
+    Job Title: {job_title}
+    Store/Business: {store_name}
+    Location: {location}
+    Key Responsibilities: {key_responsibilities}
+    Skills Required: {skills_required}
+    Working Hours: {working_hours}
+    Working Days: {working_days}
+    Salary: {salary}
+    Job Type: {job_type}
+    Contact Info: {contact_info}
+    Additional Info: {additional_info}
+
+    Create a professional job posting that includes:
+    1. A clear job title and company name
+    2. Job overview and main responsibilities
+    3. Required skills and qualifications
+    4. Working hours and schedule
+    5. Salary information
+    6. Location details
+    7. How to apply
+
+    Format it as a complete, ready-to-post job description that would attract suitable candidates for a local store position.
+    Make it professional but accessible, suitable for local job seekers.
+""", max_new_tokens=700, budgets={"key_responsibilities": 250, "skills_required": 200, "additional_info": 200}))
+
+register(PromptTemplate("store_job_summary", """
+    Create a brief, engaging summary (1-2 sentences) for this job posting:
+
+    Job Title: {job_title}
+    Store/Business: {store_name}
+    Location: {location}
+    Key Responsibilities: {key_responsibilities}
+    Working Hours: {working_hours}
+    Salary: {salary}
+    Job Type: {job_type}
+
+    The summary should highlight the key role, location, and main appeal to job seekers.
+    Keep it under 100 words and make it attractive for mobile job browsing.
+""", max_new_tokens=140, budgets={"key_responsibilities": 120}))
+
+register(PromptTemplate("smart_job_description", """
+    Create a comprehensive and engaging job description based on the following information:
+
+    Job Title: {title}
+    Company: {company}
+    Location: {location}
+    Basic Description: {description}
+    Requirements: {requirements}
+    Experience Level: {experience_level}
+    Job Type: {job_type}
+
+    Please create a professional, detailed job description that includes:
+    1. An engaging overview of the role
+    2. Key responsibilities
+    3. Required qualifications
+    4. Preferred qualifications
+    5. What the company offers
+    6. Growth opportunities
+
+    Make it attractive to potential candidates while being clear about expectations.
+""", max_new_tokens=700, budgets={"description": 500, "requirements": 300}))
+
+register(PromptTemplate("job_summary", """
+    Create a concise, engaging summary (2-3 sentences) of the following job description:
+
+    {job_description}
+
+    The summary should:
+    1. Highlight the key role and main responsibilities
+    2. Mention the most important qualifications
+    3. Be appealing to job seekers
+    4. Be under 150 words
+""", max_new_tokens=200, budgets={"job_description": 600}))
+
+register(PromptTemplate("match_analysis", """
+    Analyze how well this candidate fits this job posting.
+
+    CANDIDATE PROFILE:
+    {user_text}
+
+    JOB POSTING:
+    {job_text}
+
+    Respond with only a JSON object, no other text, matching this schema:
+    {{"match_score": <integer 0-100>, "strengths": [<short string>, ...], "gaps": [<short string>, ...], "recommendations": [<short string>, ...]}}
+    Do not use the characters {{ or }} inside strings.
+
+    {prefix}""", max_new_tokens=300, budgets={"user_text": 400, "job_text": 500}))
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Optional, Union
+
+
+class TokenBucket:
+    """
+    Async token bucket matching our Granite request quota.
+
+    Tokens refill continuously at ``rate`` per second up to ``burst``.
+    acquire() waits until enough tokens are available.
+    """
+
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate or float(os.getenv("GRANITE_RATE_LIMIT", "2"))
+        self.burst = burst or float(os.getenv("GRANITE_RATE_BURST", "5"))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, cost: float = 1.0):
+        """Wait until cost tokens are available, then take them."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        cost = min(cost, self.burst)
+        # Callers queue on the lock so tokens are handed out in FIFO order
+        async with self._lock:
+            self._refill()
+            while self._tokens < cost:
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= cost
+
+    async def try_acquire(self, cost: float = 1.0) -> bool:
+        """Take cost tokens only if they are available now and nobody is queued."""
+        if self._lock is not None and self._lock.locked():
+            return False
+        self._refill()
+        if self._tokens < min(cost, self.burst):
+            return False
+        self._tokens -= min(cost, self.burst)
+        return True
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in a SQLite file shared by all workers.
+
+    Every process on the host draws from the same bucket, so N uvicorn
+    workers together stay within one Granite quota. Each acquire is a short
+    IMMEDIATE transaction run off the event loop.
+    """
+
+    def __init__(self, db_path: str, name: str = "granite", rate: float = None, burst: float = None):
+        self.db_path = db_path
+        self.name = name
+        self.rate = rate or float(os.getenv("GRANITE_RATE_LIMIT", "2"))
+        self.burst = burst or float(os.getenv("GRANITE_RATE_BURST", "5"))
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            (name, self.burst, time.time())
+        )
+        self._lock = asyncio.Lock()
+
+    def _try_take(self, cost: float) -> float:
+        """Take cost tokens if available; otherwise return seconds to wait."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated = self._db.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / self.rate
+            self._db.execute(
+                "UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name)
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return wait
+
+    async def acquire(self, cost: float = 1.0):
+        """Wait until cost tokens are available in the shared bucket, then take them."""
+        cost = min(cost, self.burst)
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                wait = await loop.run_in_executor(None, self._try_take, cost)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+    async def try_acquire(self, cost: float = 1.0) -> bool:
+        """Take cost tokens only if they are available now and nobody is queued."""
+        if self._lock.locked():
+            return False
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            wait = await loop.run_in_executor(None, self._try_take, min(cost, self.burst))
+        return wait <= 0
+
+
+_limiter: Optional[Union[TokenBucket, SharedTokenBucket]] = None
+_limiter_configured = False
+
+def get_rate_limiter() -> Optional[Union[TokenBucket, SharedTokenBucket]]:
+    """
+    Return the Granite rate limiter, or None when no quota is configured.
+
+    Shared across processes when GRANITE_RATE_LIMIT_DB is set (multi-worker
+    mode sets it), per-process when only GRANITE_RATE_LIMIT is set.
+    """
+    global _limiter, _limiter_configured
+    if not _limiter_configured:
+        db_path = os.getenv("GRANITE_RATE_LIMIT_DB")
+        if db_path:
+            _limiter = SharedTokenBucket(db_path)
+        elif os.getenv("GRANITE_RATE_LIMIT"):
+            _limiter = TokenBucket()
+        _limiter_configured = True
+    return _limiter
+
+def reset_rate_limiter():
+    """Drop the limiter so the next call re-reads the environment."""
+    global _limiter, _limiter_configured
+    _limiter = None
+    _limiter_configured = False
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a backend that is known to be unhealthy."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``reset_timeout`` seconds; then a single trial call
+    is let through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("GRANITE_BREAKER_FAILURES", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("GRANITE_BREAKER_RESET", "30"))
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            metrics.event("circuit_rejected", self.name)
+            raise CircuitOpen(f"{self.name} is temporarily unavailable")
+        if state == "half_open":
+            self._trial_in_flight = True
+
+    def release_trial(self):
+        """Forget a half-open trial whose outcome says nothing about the backend."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+                metrics.event("circuit_opened", self.name)
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ResilientCaller:
+    """
+    Circuit breaker, per-call deadline and optional hedging for one backend.
+
+    With hedging on, a second attempt starts once the first has been running
+    longer than the observed p95 latency, and whichever finishes first wins.
+    Exceptions listed in ``ignore`` (e.g. local queue rejections) pass through
+    without counting against the backend.
+    """
+
+    def __init__(self, name: str, deadline: float = None, hedge: bool = None,
+                 ignore: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.deadline = deadline or float(os.getenv("GRANITE_CALL_DEADLINE", "30"))
+        self.hedge = hedge if hedge is not None else os.getenv("GRANITE_HEDGE_ENABLED", "") == "1"
+        self.ignore = ignore
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], deadline: float = None,
+                   admit: Optional[Callable[..., Awaitable[Any]]] = None) -> Any:
+        """
+        Run fn() under the breaker; raises CircuitOpen or asyncio.TimeoutError.
+
+        With ``admit`` (e.g. GenerationPool.admit), a slot is reserved first
+        and passed to fn as fn(slot). Waiting for it is local queueing, not
+        backend time, so it is outside the deadline and the latency sample,
+        and a rejection doesn't count against the backend.
+        """
+        self.breaker.before_call()
+        slot = None
+        if admit is not None:
+            try:
+                slot = await admit()
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._attempts(fn, slot, admit), timeout=deadline or self.deadline)
+        except self.ignore:
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled by the caller: the outcome says nothing about the backend
+            self.breaker.release_trial()
+            raise
+        finally:
+            if slot is not None:
+                slot.release()
+        self.breaker.record_success()
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def _attempts(self, fn: Callable[..., Awaitable[Any]], slot: Any,
+                        admit: Optional[Callable[..., Awaitable[Any]]]) -> Any:
+        hedge_delay = self.latency.percentile(95) if self.hedge else None
+        if hedge_delay is None:
+            return await (fn(slot) if admit is not None else fn())
+
+        first = asyncio.ensure_future(fn(slot) if admit is not None else fn())
+        pending = {first}
+        second_slot = None
+        try:
+            done, _ = await asyncio.wait([first], timeout=hedge_delay)
+            if done:
+                return first.result()
+
+            if admit is not None:
+                # Only hedge into spare capacity; never queue behind our own work
+                second_slot = await admit(wait=False)
+                if second_slot is None:
+                    metrics.event("hedge_skipped", self.name)
+                    return await first
+            metrics.event("hedged", self.name)
+            second = asyncio.ensure_future(fn(second_slot) if admit is not None else fn())
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed: surface the first attempt's error
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if second_slot is not None:
+                second_slot.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "p95_seconds": self.latency.percentile(95),
+        }
+
+
+_callers: Dict[str, ResilientCaller] = {}
+
+def get_resilient_caller(name: str, **kwargs) -> ResilientCaller:
+    """Return the shared ResilientCaller for a backend, creating it on first use."""
+    caller = _callers.get(name)
+    if caller is None:
+        caller = _callers[name] = ResilientCaller(name, **kwargs)
+    return caller
+
+def resilience_status() -> Dict[str, Dict[str, Any]]:
+    return {name: caller.status() for name, caller in _callers.items()}
+
+def reset_resilience() -> None:
+    """Close every breaker and forget latency history (tests and benchmarks)."""
+    for caller in _callers.values():
+        caller.breaker = CircuitBreaker(caller.name)
+        caller.latency = LatencyTracker()
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_input(value: str) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs share a key."""
+    return " ".join(value.lower().split())
+
+
+def make_cache_key(inputs: Dict[str, str], template: str, model_id: str, params: Dict[str, Any]) -> str:
+    """
+    Content-address a generation by its normalized inputs, prompt template,
+    model and sampling params.
+
+    ``template`` identifies the prompt template rather than the rendered
+    prompt, so inputs that differ only in case or spacing share a key.
+    """
+    payload = json.dumps(
+        {
+            "inputs": {k: normalize_input(v) for k, v in sorted(inputs.items())},
+            "template": template,
+            "model_id": model_id,
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for generated text.
+
+    The memory tier is an LRU bounded by entry count and total characters,
+    with a per-entry TTL. The optional SQLite tier survives restarts and is
+    consulted on a memory miss. Async code should use ``aget``/``aset``,
+    which run the SQLite work in the default executor.
+    """
+
+    # Expired disk rows are pruned at most this often
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self, max_entries: int = None, max_chars: int = None,
+                 ttl_seconds: float = None, db_path: Optional[str] = None):
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+        self.max_chars = max_chars or int(os.getenv("RESPONSE_CACHE_MAX_CHARS", "4000000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+        self.db_path = db_path if db_path is not None else os.getenv("RESPONSE_CACHE_PATH")
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._next_prune = 0.0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            # Several worker processes may share this file
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on a miss or expiry."""
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = self._load(key, self._read_disk(key))
+        if value is None:
+            self._count_miss()
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like get, but reads the disk tier off the event loop."""
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            loop = asyncio.get_running_loop()
+            value = self._load(key, await loop.run_in_executor(None, self._read_disk, key))
+        if value is None:
+            self._count_miss()
+        return value
+
+    def set(self, key: str, value: str):
+        """Store value under key in both tiers."""
+        expires_at = self._set_memory(key, value)
+        if self._db is not None:
+            self._write_disk(key, value, expires_at)
+
+    async def aset(self, key: str, value: str):
+        """Like set, but writes the disk tier off the event loop."""
+        expires_at = self._set_memory(key, value)
+        if self._db is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_disk, key, value, expires_at)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            return None
+
+    def _set_memory(self, key: str, value: str) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._insert(key, value, expires_at)
+        return expires_at
+
+    def _load(self, key: str, row: Optional[Tuple[str, float]]) -> Optional[str]:
+        """Promote a live disk row into the memory tier."""
+        if row is None or row[1] <= time.time():
+            return None
+        with self._lock:
+            # A set that raced the read is newer than the disk row
+            if key not in self._entries:
+                self._insert(key, row[0], row[1])
+            self.disk_hits += 1
+        return row[0]
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            try:
+                return self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache disk read failed: {str(e)}")
+                return None
+
+    def _write_disk(self, key: str, value: str, expires_at: float):
+        now = time.time()
+        with self._db_lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                if now >= self._next_prune:
+                    self._next_prune = now + self.PRUNE_INTERVAL
+                    self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache disk write failed: {str(e)}")
+
+    def _insert(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._chars += len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._chars > self.max_chars):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._chars -= len(evicted)
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._chars -= len(value)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current memory-tier size."""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "chars": self._chars,
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Return the per-process response cache."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[str], Awaitable[Optional[np.ndarray]]]
+
+
+class SemanticCache:
+    """
+    Reuse a past generation when a new input is a near-duplicate of an old one.
+
+    Inputs are embedded with the service's sentence-transformer and compared
+    against a fixed-size float32 matrix of past input embeddings with one
+    matrix-vector product. A hit needs cosine similarity of at least
+    ``threshold``. When full, the least recently used slot is overwritten,
+    so memory is bounded by ``max_entries``.
+    """
+
+    def __init__(self, name: str, embed: EmbedFn, dimension: int,
+                 threshold: float = None, max_entries: int = None):
+        self.name = name
+        self.embed = embed
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+        self._vectors = np.zeros((self.max_entries, dimension), dtype=np.float32)
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+        self._values: list = [None] * self.max_entries
+        self._size = 0
+        self.lookups = 0
+        self.saved_calls = 0
+
+    async def lookup(self, text: str) -> Optional[str]:
+        """Return a stored generation for a near-duplicate input, if any."""
+        self.lookups += 1
+        if self._size == 0:
+            return None
+        vector = await self._embed(text)
+        if vector is None:
+            return None
+        scores = self._vectors[:self._size] @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        self._last_used[best] = time.monotonic()
+        self.saved_calls += 1
+        metrics.event("semantic_cache_hit", self.name)
+        return self._values[best]
+
+    async def add(self, text: str, value: str):
+        """Remember a generation for this input."""
+        vector = await self._embed(text)
+        if vector is None:
+            return
+        if self._size < self.max_entries:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        self._vectors[slot] = vector
+        self._values[slot] = value
+        self._last_used[slot] = time.monotonic()
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            return await self.embed(text)
+        except Exception as e:
+            logger.warning(f"Semantic cache {self.name} could not embed input: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": self._size,
+            "lookups": self.lookups,
+            "saved_calls": self.saved_calls,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from generation_pool import GenerationPool, GenerationQueueFull
+
+
+def test_timed_out_call_keeps_its_slot():
+    async def scenario():
+        pool = GenerationPool(max_in_flight=1, max_queue=0, queue_timeout=1.0)
+        release = threading.Event()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.run(release.wait), timeout=0.05)
+            # The SDK thread is still running, so the slot is still taken
+            assert pool.in_flight == 1
+            with pytest.raises(GenerationQueueFull):
+                await pool.run(lambda: "next")
+
+            release.set()
+            for _ in range(100):
+                if pool.in_flight == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert pool.in_flight == 0
+            assert await pool.run(lambda: "next") == "next"
+        finally:
+            release.set()
+            pool.shutdown()
+    asyncio.run(scenario())
+
+
+def test_run_returns_result_and_raises_errors():
+    async def scenario():
+        pool = GenerationPool(max_in_flight=2, max_queue=2)
+
+        def fail():
+            raise ValueError("bad prompt")
+
+        try:
+            assert await pool.run(lambda: 42) == 42
+            with pytest.raises(ValueError):
+                await pool.run(fail)
+            await asyncio.sleep(0)
+            assert pool.in_flight == 0
+        finally:
+            pool.shutdown()
+    asyncio.run(scenario())
+
+
+def test_stream_yields_items_in_order():
+    async def scenario():
+        pool = GenerationPool(max_in_flight=1, max_queue=0)
+        try:
+            items = [item async for item in pool.stream(lambda: iter(["a", "b", "c"]))]
+            assert items == ["a", "b", "c"]
+        finally:
+            pool.shutdown()
+    asyncio.run(scenario())
+
+
+def test_no_rate_limit_without_a_quota(monkeypatch):
+    import rate_limit
+
+    monkeypatch.delenv("GRANITE_RATE_LIMIT", raising=False)
+    monkeypatch.delenv("GRANITE_RATE_LIMIT_DB", raising=False)
+    rate_limit.reset_rate_limiter()
+    try:
+        assert rate_limit.get_rate_limiter() is None
+    finally:
+        rate_limit.reset_rate_limiter()
+
+
+def test_rate_limit_wait_is_bounded_and_holds_no_slot(monkeypatch):
+    import rate_limit
+
+    monkeypatch.setenv("GRANITE_RATE_LIMIT", "0.1")
+    monkeypatch.setenv("GRANITE_RATE_BURST", "1")
+    monkeypatch.delenv("GRANITE_RATE_LIMIT_DB", raising=False)
+    rate_limit.reset_rate_limiter()
+
+    async def scenario():
+        pool = GenerationPool(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        try:
+            assert await pool.run(lambda: "first") == "first"
+            waiting = asyncio.ensure_future(pool.run(lambda: "throttled"))
+            await asyncio.sleep(0.01)
+            # Throttled callers wait for quota before taking a slot
+            assert pool.in_flight == 0
+            with pytest.raises(GenerationQueueFull):
+                await waiting
+        finally:
+            pool.shutdown()
+    try:
+        asyncio.run(scenario())
+    finally:
+        rate_limit.reset_rate_limiter()
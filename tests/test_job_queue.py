@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+from generation_pool import GenerationQueueFull
+from job_queue import JobQueue
+
+
+async def wait_for_status(queue: JobQueue, job_id: str, status: str, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {job['status']}, expected {status}")
+
+
+def test_identical_jobs_are_deduplicated(tmp_path):
+    async def scenario():
+        calls = []
+
+        async def handler(payload):
+            calls.append(payload)
+            return {"n": len(calls)}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), {"echo": handler}, workers=1, poll_interval=0.01)
+        queue.start()
+        try:
+            first = await queue.submit("echo", {"role": "cashier"})
+            assert await queue.submit("echo", {"role": "cashier"}) == first
+            job = await wait_for_status(queue, first, "done")
+            assert job["result"] == {"n": 1}
+            assert await queue.submit("echo", {"role": "cashier"}) == first
+            assert len(calls) == 1
+        finally:
+            await queue.stop()
+    asyncio.run(scenario())
+
+
+def test_fresh_submission_reruns_finished_job(tmp_path):
+    async def scenario():
+        calls = []
+
+        async def handler(payload):
+            calls.append(payload)
+            return {"n": len(calls)}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), {"echo": handler}, workers=1, poll_interval=0.01)
+        queue.start()
+        try:
+            payload = {"role": "cashier", "fresh": True}
+            first = await queue.submit("echo", payload, reuse_done=False)
+            await wait_for_status(queue, first, "done")
+            second = await queue.submit("echo", payload, reuse_done=False)
+            assert second != first
+            job = await wait_for_status(queue, second, "done")
+            assert job["result"] == {"n": 2}
+            # The earlier result is still readable
+            assert (await queue.get(first))["result"] == {"n": 1}
+        finally:
+            await queue.stop()
+    asyncio.run(scenario())
+
+
+def test_queue_full_is_deferred_without_using_attempts(tmp_path):
+    async def scenario():
+        calls = []
+
+        async def handler(payload):
+            calls.append(payload)
+            if len(calls) <= 3:
+                raise GenerationQueueFull("busy", retry_after=0)
+            return {"ok": True}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), {"echo": handler}, workers=1,
+                         max_attempts=1, poll_interval=0.01)
+        queue.start()
+        try:
+            job_id = await queue.submit("echo", {"role": "cashier"})
+            job = await wait_for_status(queue, job_id, "done")
+            assert job["attempts"] == 1
+            assert len(calls) == 4
+        finally:
+            await queue.stop()
+    asyncio.run(scenario())
+
+
+def test_failures_are_retried_with_backoff(tmp_path):
+    async def scenario():
+        calls = []
+
+        async def handler(payload):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RuntimeError("backend down")
+            return {"ok": True}
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), {"echo": handler}, workers=1,
+                         max_attempts=2, poll_interval=0.01, retry_backoff=0.2)
+        queue.start()
+        try:
+            job_id = await queue.submit("echo", {"role": "cashier"})
+            job = await wait_for_status(queue, job_id, "done")
+            assert job["attempts"] == 2
+            # The retry waited at least half the base backoff
+            assert calls[1] - calls[0] >= 0.1
+        finally:
+            await queue.stop()
+    asyncio.run(scenario())
+
+
+def test_failures_stop_after_max_attempts(tmp_path):
+    async def scenario():
+        async def handler(payload):
+            raise RuntimeError("backend down")
+
+        queue = JobQueue(str(tmp_path / "jobs.db"), {"echo": handler}, workers=1,
+                         max_attempts=2, poll_interval=0.01, retry_backoff=0)
+        queue.start()
+        try:
+            job_id = await queue.submit("echo", {"role": "cashier"})
+            job = await wait_for_status(queue, job_id, "failed")
+            assert job["attempts"] == 2
+            assert job["result"] is None
+        finally:
+            await queue.stop()
+    asyncio.run(scenario())
@@ -0,0 +1,20 @@
+from json_extract import JsonObjectScanner, extract_json_object, loads_tolerant
+
+
+def test_scanner_stops_at_closing_brace_across_chunks():
+    scanner = JsonObjectScanner()
+    assert scanner.feed('{"match_score":') is None
+    assert scanner.text == '{"match_score":'
+    assert scanner.feed(' 80, "gaps": ["a}"]') is None
+    assert scanner.feed('} and then prose') == '{"match_score": 80, "gaps": ["a}"]}'
+    assert scanner.text == scanner.result
+
+
+def test_scanner_skips_leading_prose():
+    scanner = JsonObjectScanner()
+    assert scanner.feed('Sure! ```json\n{"a": {"b": 1}}```') == '{"a": {"b": 1}}'
+
+
+def test_tolerant_parsing_and_extraction():
+    assert loads_tolerant('{"a": [1, 2,],}') == {"a": [1, 2]}
+    assert extract_json_object('Here you go: {"a": 1} thanks') == {"a": 1}
@@ -0,0 +1,252 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpen, ResilientCaller
+
+
+class LocalError(Exception):
+    pass
+
+
+def make_caller(**kwargs) -> ResilientCaller:
+    caller = ResilientCaller("test", deadline=1.0, hedge=False, **kwargs)
+    caller.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    return caller
+
+
+async def ok():
+    return "ok"
+
+
+async def boom():
+    raise RuntimeError("backend down")
+
+
+async def open_circuit(caller: ResilientCaller):
+    for _ in range(caller.breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            await caller.call(boom)
+    assert caller.breaker.state == "open"
+
+
+def test_opens_after_threshold_and_rejects():
+    async def scenario():
+        caller = make_caller()
+        await open_circuit(caller)
+        with pytest.raises(CircuitOpen):
+            await caller.call(ok)
+    asyncio.run(scenario())
+
+
+def test_half_open_success_closes():
+    async def scenario():
+        caller = make_caller()
+        await open_circuit(caller)
+        time.sleep(0.06)
+        assert caller.breaker.state == "half_open"
+        assert await caller.call(ok) == "ok"
+        assert caller.breaker.state == "closed"
+        assert caller.breaker.failures == 0
+    asyncio.run(scenario())
+
+
+def test_half_open_failure_reopens():
+    async def scenario():
+        caller = make_caller()
+        await open_circuit(caller)
+        time.sleep(0.06)
+        with pytest.raises(RuntimeError):
+            await caller.call(boom)
+        assert caller.breaker.state == "open"
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_one_trial():
+    async def scenario():
+        caller = make_caller()
+        await open_circuit(caller)
+        time.sleep(0.06)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        trial = asyncio.ensure_future(caller.call(slow))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpen):
+            await caller.call(ok)
+        release.set()
+        assert await trial == "ok"
+        assert caller.breaker.state == "closed"
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_releases_half_open():
+    async def scenario():
+        caller = make_caller()
+        await open_circuit(caller)
+        time.sleep(0.06)
+
+        trial = asyncio.ensure_future(caller.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        assert caller.breaker.state == "half_open"
+        for _ in range(3):
+            assert await caller.call(ok) == "ok"
+        assert caller.breaker.state == "closed"
+    asyncio.run(scenario())
+
+
+def test_ignored_errors_do_not_count():
+    async def scenario():
+        caller = make_caller(ignore=(LocalError,))
+
+        async def rejected():
+            raise LocalError("queue full")
+
+        for _ in range(5):
+            with pytest.raises(LocalError):
+                await caller.call(rejected)
+        assert caller.breaker.state == "closed"
+        assert caller.breaker.failures == 0
+    asyncio.run(scenario())
+
+
+def test_deadline_counts_as_failure():
+    async def scenario():
+        caller = make_caller()
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await caller.call(lambda: asyncio.sleep(10), deadline=0.01)
+        assert caller.breaker.state == "open"
+    asyncio.run(scenario())
+
+
+def test_deadline_during_hedge_delay_cancels_first_attempt():
+    async def scenario():
+        caller = ResilientCaller("test", deadline=1.0, hedge=True)
+        for _ in range(caller.latency.min_samples):
+            caller.latency.record(1.0)
+        started = []
+        cancelled = []
+
+        async def attempt():
+            started.append(1)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(attempt, deadline=0.05)
+        await asyncio.sleep(0)
+        assert started == [1]
+        assert cancelled == [1]
+    asyncio.run(scenario())
+
+
+def test_hedge_returns_faster_attempt():
+    async def scenario():
+        caller = ResilientCaller("test", deadline=1.0, hedge=True)
+        for _ in range(caller.latency.min_samples):
+            caller.latency.record(0.01)
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+                return "first"
+            return "second"
+
+        assert await caller.call(attempt) == "second"
+        assert len(calls) == 2
+    asyncio.run(scenario())
+
+
+def test_local_queueing_does_not_trip_the_breaker():
+    import threading
+
+    from generation_pool import GenerationPool
+
+    async def scenario():
+        pool = GenerationPool(max_in_flight=1, max_queue=10, queue_timeout=5.0)
+        caller = make_caller()
+        release = threading.Event()
+        try:
+            # Saturate the pool with a call that outlives every queued deadline
+            busy = asyncio.ensure_future(pool.run(release.wait, 1.0))
+            await asyncio.sleep(0.01)
+            queued = [
+                asyncio.ensure_future(caller.call(lambda slot: slot.run(lambda: "ok"), deadline=0.2, admit=pool.admit))
+                for _ in range(5)
+            ]
+            await asyncio.sleep(0.4)
+            assert caller.breaker.state == "closed"
+            release.set()
+            assert await asyncio.gather(*queued) == ["ok"] * 5
+            await busy
+            assert caller.breaker.state == "closed"
+            assert caller.breaker.failures == 0
+        finally:
+            release.set()
+            pool.shutdown()
+    asyncio.run(scenario())
+
+
+def test_pool_rejection_does_not_count_against_the_backend():
+    import threading
+
+    from generation_pool import GenerationPool, GenerationQueueFull
+
+    async def scenario():
+        pool = GenerationPool(max_in_flight=1, max_queue=0)
+        caller = make_caller()
+        release = threading.Event()
+        try:
+            busy = asyncio.ensure_future(pool.run(release.wait, 1.0))
+            await asyncio.sleep(0.01)
+            for _ in range(5):
+                with pytest.raises(GenerationQueueFull):
+                    await caller.call(lambda slot: slot.run(lambda: "ok"), admit=pool.admit)
+            assert caller.breaker.state == "closed"
+            release.set()
+            await busy
+        finally:
+            release.set()
+            pool.shutdown()
+    asyncio.run(scenario())
+
+
+def test_hedge_is_skipped_without_spare_capacity():
+    import threading
+
+    from generation_pool import GenerationPool
+
+    async def scenario():
+        pool = GenerationPool(max_in_flight=1, max_queue=4)
+        caller = ResilientCaller("test", deadline=2.0, hedge=True)
+        for _ in range(caller.latency.min_samples):
+            caller.latency.record(0.01)
+        calls = []
+
+        def slow():
+            calls.append(1)
+            threading.Event().wait(0.1)
+            return "done"
+
+        try:
+            assert await caller.call(lambda slot: slot.run(slow), admit=pool.admit) == "done"
+            assert len(calls) == 1
+            await asyncio.sleep(0.01)
+            assert pool.in_flight == 0
+        finally:
+            pool.shutdown()
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+
+from prompt_templates import template_fingerprint
+from response_cache import ResponseCache, make_cache_key
+
+PARAMS = {"max_new_tokens": 900, "temperature": 0.7}
+
+
+def job_key(role: str, skills: str, hours: str) -> str:
+    return make_cache_key(
+        {"role": role, "skills": skills, "hours": hours},
+        template_fingerprint("job_description"), "model", PARAMS
+    )
+
+
+def test_inputs_differing_in_case_and_spacing_share_a_key():
+    assert job_key("Cashier", "customer service", "9-5") == job_key("cashier ", "Customer  service", " 9-5")
+
+
+def test_different_inputs_template_or_params_change_the_key():
+    key = job_key("Cashier", "customer service", "9-5")
+    assert job_key("Stocker", "customer service", "9-5") != key
+    assert make_cache_key(
+        {"role": "Cashier", "skills": "customer service", "hours": "9-5"},
+        template_fingerprint("job_summary"), "model", PARAMS
+    ) != key
+    assert make_cache_key(
+        {"role": "Cashier", "skills": "customer service", "hours": "9-5"},
+        template_fingerprint("job_description"), "model", dict(PARAMS, temperature=0.2)
+    ) != key
+
+
+def test_memory_tier_round_trip():
+    cache = ResponseCache(max_entries=2, db_path="")
+    cache.set("a", "one")
+    cache.set("b", "two")
+    cache.set("c", "three")
+    assert cache.get("a") is None
+    assert cache.get("c") == "three"
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "responses.db")
+        first = ResponseCache(db_path=path)
+        await first.aset("a", "one")
+        first.close()
+
+        second = ResponseCache(db_path=path)
+        try:
+            assert await second.aget("a") == "one"
+            assert second.disk_hits == 1
+            # Now served from memory
+            assert await second.aget("a") == "one"
+            assert second.hits == 1
+            assert await second.aget("missing") is None
+            assert second.misses == 1
+        finally:
+            second.close()
+    asyncio.run(scenario())